@@ -0,0 +1,3 @@
+"""
+Benchmarks for bootalchemy.  See benchmarks.run for the runner.
+"""
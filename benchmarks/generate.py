@@ -0,0 +1,60 @@
+"""
+A deterministic generator of fixtures for benchmarks.model.
+
+The same arguments always produce the same data, so timings of different
+commits are comparable.
+"""
+import random
+
+def generate(rows=1000, reference_density=0.5, nesting_depth=0, fanout=2, datetime_mix=0.5, seed=0):
+    """
+    returns from_list data with rows Posts, plus the Tags and Authors they use.
+
+    reference_density
+        fraction of posts which reference their author's id with a "*" attribute reference.
+    nesting_depth
+        depth of the chain of nested "!Category" objects each post is given, 0 for none.
+    fanout
+        number of tags, referenced by object, on each post.
+    datetime_mix
+        fraction of posts which have their date and time columns set from strings.
+    """
+    rnd = random.Random(seed)
+    tag_count = max(1, fanout * 5)
+    author_count = max(1, rows // 10)
+
+    tags = [{'&tag%d' % i: {'name': 'tag %d' % i}} for i in range(tag_count)]
+    authors = []
+    for i in range(author_count):
+        authors.append({'author_id': '&author%d' % i,
+                        'name': 'author %d' % i,
+                        'joined': '20%02d-%02d-%02d' % (rnd.randint(0, 20), rnd.randint(1, 12), rnd.randint(1, 28)),
+                        'active': rnd.choice(['Y', 'N', True, False])})
+
+    posts = []
+    for i in range(rows):
+        post = {'title': 'post %d' % i,
+                'score': rnd.random() * 100,
+                'draft': rnd.choice(['yes', 'no', True, False])}
+        if rnd.random() < reference_density:
+            post['author_id'] = '*author%d' % rnd.randrange(author_count)
+        if rnd.random() < datetime_mix:
+            post['published'] = '20%02d-%02d-%02d %02d:%02d:%02d' % (
+                rnd.randint(0, 20), rnd.randint(1, 12), rnd.randint(1, 28),
+                rnd.randint(0, 23), rnd.randint(0, 59), rnd.randint(0, 59))
+            post['reminder'] = '%02d:%02d' % (rnd.randint(0, 23), rnd.randint(0, 59))
+        if fanout:
+            post['tags'] = ['*tag%d' % t for t in rnd.sample(range(tag_count), min(fanout, tag_count))]
+        category = None
+        for depth in range(nesting_depth):
+            values = {'name': 'category %d.%d' % (i, depth)}
+            if category is not None:
+                values['parent'] = category
+            category = {'!Category': values}
+        if category is not None:
+            post['category'] = category
+        posts.append(post)
+
+    return [{'Tag': tags, 'flush': None},
+            {'Author': authors},
+            {'Post': posts, 'flush': None}]
@@ -0,0 +1,65 @@
+"""
+Measures how long importing bootalchemy takes in a fresh interpreter, and which
+of the heavier optional modules the import pulls in, as json::
+
+    python -m benchmarks.imports --repeat 20
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# the interpreters run from the checkout, so that it is what they import.
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# statements timed, each in its own interpreter.
+statements = {'loader': 'import bootalchemy.loader',
+              'cli': 'import bootalchemy.cli',
+              'yaml_loader': 'import bootalchemy.loader; bootalchemy.loader.YamlLoader("os")',
+              }
+
+# modules which should only be imported once they are needed.
+deferred = ('yaml', 'pprint', 'sqlalchemy.dialects.postgresql', 'multiprocessing', 'cProfile')
+
+script = '''
+import sys, time, json
+start = time.perf_counter()
+%s
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'modules': [m for m in %r if m in sys.modules]}))
+'''
+
+def measure(statement, repeat=10):
+    """
+    returns the best time of repeat fresh imports, and the deferred modules loaded.
+    """
+    times = []
+    modules = None
+    for i in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', script % (statement, deferred)], cwd=root)
+        result = json.loads(output.decode('utf-8').splitlines()[-1])
+        times.append(result['seconds'])
+        modules = result['modules']
+    return {'seconds': min(times), 'modules': modules}
+
+def run(repeat=10, names=None):
+    results = []
+    for name in names or sorted(statements):
+        result = measure(statements[name], repeat)
+        result['name'] = name
+        results.append(result)
+    return {'python': sys.version.split()[0], 'repeat': repeat, 'results': results}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.imports')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--statement', action='append', choices=sorted(statements),
+                        help='statements to time, default all')
+    args = parser.parse_args(argv)
+    json.dump(run(args.repeat, args.statement), sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+The model the benchmark fixtures are generated for.  It covers the column types
+_check_types casts, a foreign key, a many-to-many relation and a self-referential
+relation for nesting.
+"""
+from sqlalchemy import Table, ForeignKey, Column, MetaData
+from sqlalchemy.types import Unicode, Integer, Float, Boolean, Date, DateTime, Time
+from sqlalchemy.orm import relation
+from sqlalchemy.ext.declarative import declarative_base
+
+metadata = MetaData()
+DeclarativeBase = declarative_base(metadata=metadata)
+
+post_tag_table = Table('bench_post_tag', metadata,
+    Column('post_id', Integer, ForeignKey('bench_post.post_id'), primary_key=True),
+    Column('tag_id', Integer, ForeignKey('bench_tag.tag_id'), primary_key=True)
+)
+
+class Tag(DeclarativeBase):
+    __tablename__ = 'bench_tag'
+    tag_id = Column(Integer, primary_key=True)
+    name = Column(Unicode(50), nullable=False)
+
+class Author(DeclarativeBase):
+    __tablename__ = 'bench_author'
+    author_id = Column(Integer, primary_key=True)
+    name = Column(Unicode(100), nullable=False)
+    joined = Column(Date)
+    active = Column(Boolean)
+
+class Category(DeclarativeBase):
+    __tablename__ = 'bench_category'
+    category_id = Column(Integer, primary_key=True)
+    name = Column(Unicode(100))
+    parent_id = Column(Integer, ForeignKey('bench_category.category_id'))
+    parent = relation('Category', remote_side=[category_id])
+
+class Post(DeclarativeBase):
+    __tablename__ = 'bench_post'
+    post_id = Column(Integer, primary_key=True)
+    title = Column(Unicode(200), nullable=False)
+    score = Column(Float)
+    draft = Column(Boolean)
+    published = Column(DateTime)
+    reminder = Column(Time)
+    author_id = Column(Integer, ForeignKey('bench_author.author_id'))
+    category_id = Column(Integer, ForeignKey('bench_category.category_id'))
+    category = relation(Category)
+    tags = relation(Tag, secondary=post_tag_table)
@@ -0,0 +1,192 @@
+"""
+Runs the loaders over generated fixtures and reports rows/sec, peak memory and
+statement counts as json::
+
+    python -m benchmarks.run --rows 10000 --output before.json
+    python -m benchmarks.run --rows 10000 --compare before.json
+
+Each mode loads the same fixture, written in the format the mode reads, into a
+fresh in-memory or file-backed SQLite database.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import subprocess
+
+import yaml
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from bootalchemy import __version__
+from bootalchemy.loader import YamlLoader, JsonLoader
+from bootalchemy.compiled import CompiledLoader, compile_file
+
+from . import model
+from .generate import generate
+
+def load_yaml(path, session, **kw):
+    return YamlLoader(model, **kw).loadf(session, path)
+
+def load_stream(path, session):
+    return YamlLoader(model).loadf(session, path, stream=True)
+
+def load_json(path, session):
+    return JsonLoader(model).loadf(session, path)
+
+def load_compiled(path, session):
+    return CompiledLoader(model).loadf(session, path)
+
+# mode name: (fixture format, load function)
+modes = {'orm': ('yaml', load_yaml),
+         'bulk': ('yaml', lambda path, session: load_yaml(path, session, bulk=True)),
+         'preallocate': ('yaml', lambda path, session: load_yaml(path, session, preallocate_keys=True)),
+         'stream': ('yaml', load_stream),
+         'json': ('json', load_json),
+         'compiled': ('bin', load_compiled),
+         }
+
+databases = ('memory', 'file')
+
+def write_fixtures(data, directory):
+    """
+    write data in every format the modes read, returns {format: path}.
+    """
+    paths = {}
+    dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+    paths['yaml'] = os.path.join(directory, 'fixture.yaml')
+    with open(paths['yaml'], 'w') as f:
+        yaml.dump(data, f, Dumper=dumper)
+    paths['json'] = os.path.join(directory, 'fixture.json')
+    with open(paths['json'], 'w') as f:
+        json.dump(data, f)
+    paths['bin'] = os.path.join(directory, 'fixture.bin')
+    compile_file(YamlLoader(model), paths['yaml'], paths['bin'])
+    return paths
+
+def run_one(mode, database, path, directory, memory=False):
+    """
+    load path with mode into a new database, returns the measurements.
+    """
+    if database == 'memory':
+        url = 'sqlite://'
+    else:
+        db_path = os.path.join(directory, '%s.db' % mode)
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        url = 'sqlite:///' + db_path
+    engine = create_engine(url)
+    model.metadata.create_all(bind=engine)
+    statements = [0]
+    def count(*args):
+        statements[0] += 1
+    event.listen(engine, 'before_cursor_execute', count)
+    session = sessionmaker(bind=engine)()
+
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    stats = modes[mode][1](path, session)
+    session.commit()
+    elapsed = time.perf_counter() - start
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    session.close()
+    engine.dispose()
+    return {'mode': mode,
+            'database': database,
+            'rows': stats.total_rows,
+            'seconds': elapsed,
+            'rows_per_sec': stats.total_rows / elapsed if elapsed else None,
+            'peak_memory': peak,
+            'statements': statements[0],
+            'flushes': stats.flushes,
+            'phases': stats.times,
+            }
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(rows=1000, reference_density=0.5, nesting_depth=0, fanout=2, datetime_mix=0.5,
+        seed=0, mode_names=None, database_names=None, memory=True):
+    """
+    run the benchmarks, returns the results as a json-able dict.
+    """
+    parameters = dict(rows=rows, reference_density=reference_density, nesting_depth=nesting_depth,
+                      fanout=fanout, datetime_mix=datetime_mix, seed=seed)
+    data = generate(**parameters)
+    directory = tempfile.mkdtemp(prefix='bootalchemy-bench-')
+    results = []
+    try:
+        paths = write_fixtures(data, directory)
+        for mode in mode_names or sorted(modes):
+            for database in database_names or databases:
+                result = run_one(mode, database, paths[modes[mode][0]], directory)
+                if memory:
+                    # tracemalloc slows loading down, so memory is measured in a run of its own.
+                    result['peak_memory'] = run_one(mode, database, paths[modes[mode][0]], directory,
+                                                    memory=True)['peak_memory']
+                results.append(result)
+    finally:
+        shutil.rmtree(directory)
+    return {'bootalchemy': __version__,
+            'revision': git_revision(),
+            'python': sys.version.split()[0],
+            'parameters': parameters,
+            'results': results}
+
+def compare(old, new, out):
+    """
+    write the rows/sec of new against old, for the runs both have.
+    """
+    before = dict(((r['mode'], r['database']), r) for r in old['results'])
+    for result in new['results']:
+        key = (result['mode'], result['database'])
+        if key not in before or not before[key]['rows_per_sec']:
+            continue
+        ratio = result['rows_per_sec'] / before[key]['rows_per_sec']
+        out.write('%-12s %-8s %12.0f -> %12.0f rows/sec  %6.2fx\n' % (
+            key[0], key[1], before[key]['rows_per_sec'], result['rows_per_sec'], ratio))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run')
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--reference-density', type=float, default=0.5)
+    parser.add_argument('--nesting-depth', type=int, default=0)
+    parser.add_argument('--fanout', type=int, default=2)
+    parser.add_argument('--datetime-mix', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mode', action='append', choices=sorted(modes), help='modes to run, default all')
+    parser.add_argument('--database', action='append', choices=databases, help='databases to use, default all')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory runs')
+    parser.add_argument('--output', help='write the json results to this file instead of stdout')
+    parser.add_argument('--compare', metavar='FILE', help='compare rows/sec with earlier json results')
+    args = parser.parse_args(argv)
+
+    results = run(rows=args.rows, reference_density=args.reference_density,
+                  nesting_depth=args.nesting_depth, fanout=args.fanout,
+                  datetime_mix=args.datetime_mix, seed=args.seed,
+                  mode_names=args.mode, database_names=args.database, memory=not args.no_memory)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results, sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
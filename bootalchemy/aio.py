@@ -0,0 +1,212 @@
+"""
+Loading fixtures through an asyncio SQLAlchemy session.
+
+The asyncio loaders take an AsyncSession where the other loaders take a Session,
+and their load methods are coroutines::
+
+    engine = create_async_engine('sqlite+aiosqlite:///test.db')
+    async with AsyncSession(engine) as session:
+        await AsyncYamlLoader(model).loadf(session, 'users.yaml')
+        await session.commit()
+
+Rows are built by the same code as in the other loaders, run through
+AsyncSession.run_sync, so references, nesting and the flush, commit and clear
+keys work as they do there, and every flush and query is awaited.  Parsing, and
+casting the plain values of the rows to their column types, is done in an
+executor, off the event loop; when streaming, each chunk is parsed and cast there
+as it is needed.  flush_every defaults to batch_size, so that the event loop gets
+a turn at least every batch_size rows.
+
+Needs SQLAlchemy 1.4 or later and an asyncio driver, such as aiosqlite.
+"""
+import json
+import asyncio
+from functools import partial
+
+try:
+    from sqlalchemy.util import await_only
+except ImportError:
+    await_only = None
+
+from .loader import Loader, YamlLoader, JsonLoader, perf_counter
+from .stats import LoadStats
+
+_done = object()
+
+class AsyncLoader(object):
+    """
+       Asyncio Loader, mixed in ahead of one of the loader classes.
+
+       *Arguments*
+          executor
+            the concurrent.futures executor parsing and casting are done in.  Defaults
+            to the default executor of the event loop.
+
+       The other arguments are those of the loader class.
+    """
+
+    def __init__(self, model, *args, executor=None, **kw):
+        if kw.get('flush_every') is None and kw.get('commit_every') is None:
+            kw['flush_every'] = kw.get('batch_size', 1000)
+        super(AsyncLoader, self).__init__(model, *args, **kw)
+        self.executor = executor
+        # the groups are parsed and cast in the executor instead.
+        self.pipeline = False
+
+    def run(self, func, *args):
+        """
+        returns a future for func(*args), called in the executor.
+        """
+        return asyncio.get_running_loop().run_in_executor(self.executor, partial(func, *args))
+
+    def prepare(self, parse, *args):
+        """
+        parse(*args) and cast the result, as the executor does for the load methods.
+        Returns (data, parse time, cast time).
+        """
+        start = perf_counter()
+        data = parse(*args)
+        middle = perf_counter()
+        if self.precast_groups:
+            self.cast_groups(data)
+        return data, middle - start, perf_counter() - middle
+
+    async def load_parsed(self, session, parse, *args):
+        """
+        Load what parse(*args) returns, parsing and casting it in the executor.
+        Returns the stats.
+        """
+        data, parse_time, cast_time = await self.run(self.prepare, parse, *args)
+        try:
+            if data:
+                self._precast = self.precast_groups
+                stats = await session.run_sync(self._from_list, data)
+            else:
+                stats = self.stats = LoadStats()
+        finally:
+            self._precast = False
+            self.clear_positions()
+        stats.times['parse'] += parse_time
+        stats.times['check_types'] += cast_time
+        return stats
+
+    async def from_list(self, session, data):
+        """
+        Load data, as Loader.from_list does, through an AsyncSession.  Returns the
+        stats.  A list is copied and cast in the executor before it is loaded, leaving
+        data as it was; the groups of any other iterable are produced and cast in the
+        executor as they are needed.
+        """
+        cast_time = 0.0
+        if isinstance(data, (list, tuple)):
+            if self.precast_groups:
+                data, cast_time = await self.run(self._cast_copy, data)
+                self._precast = True
+        else:
+            data = self._offloaded(iter(data))
+            self._precast = self.precast_groups
+        try:
+            stats = await session.run_sync(self._from_list, data)
+        finally:
+            self._precast = False
+        stats.times['check_types'] += cast_time
+        return stats
+
+    def _cast_copy(self, data):
+        """
+        returns a cast copy of the groups of data, and the time it took.  The rows are
+        copied, their nested values are shared.
+        """
+        start = perf_counter()
+        copied = []
+        for group in data:
+            group = dict(group)
+            for name, items in group.items():
+                if name not in self.control_keys and isinstance(items, list):
+                    group[name] = [self._copy_item(item) for item in items]
+            copied.append(self.cast_group(group))
+        return copied, perf_counter() - start
+
+    def _copy_item(self, item):
+        if not isinstance(item, dict):
+            return item
+        ref_name, values = self._unwrap(item)
+        if ref_name:
+            return {ref_name: dict(values)}
+        return dict(item)
+
+    def _from_list(self, session, data):
+        return Loader.from_list(self, session, data)
+
+    def _offloaded(self, groups):
+        """
+        yield the groups of an iterator, each produced and cast in the executor.  Runs
+        inside run_sync, where await_only waits for the executor.
+        """
+        while True:
+            group = await_only(self.run(self._next_group, groups))
+            if group is _done:
+                return
+            yield group
+
+    def _next_group(self, groups):
+        group = next(groups, _done)
+        if group is not _done and self.precast_groups:
+            self.cast_group(group)
+        return group
+
+class AsyncYamlLoader(AsyncLoader, YamlLoader):
+    """
+       Asyncio Yaml Loader.  See :class:`AsyncLoader` and
+       :class:`bootalchemy.loader.YamlLoader` for the arguments.
+    """
+
+    async def loadf(self, session, filename, stream=False):
+        """
+        Load a yaml file by filename.  With stream=True the file is parsed and inserted
+        a chunk at a time, as YamlLoader.loadf does.
+        """
+        self.source = filename
+        if stream:
+            with open(filename) as f:
+                return await self.load_stream(session, f)
+        return await self.load_parsed(session, self.read, filename)
+
+    async def loads(self, session, s):
+        """
+        Load a yaml string into the database.
+        """
+        return await self.load_parsed(session, self.parse, s)
+
+    async def load_stream(self, session, stream):
+        """
+        Load a yaml string or file object into the database, a chunk at a time.  See
+        YamlLoader.iter_groups.
+        """
+        try:
+            return await self.from_list(session, self.iter_groups(stream))
+        finally:
+            self.clear_positions()
+
+class AsyncJsonLoader(AsyncLoader, JsonLoader):
+    """
+       Asyncio Json Loader.  See :class:`AsyncLoader` and
+       :class:`bootalchemy.loader.JsonLoader` for the arguments.
+    """
+
+    async def loadf(self, session, filename):
+        """
+        Load a json file by filename.
+        """
+        self.source = filename
+        return await self.load_parsed(session, self._read, filename)
+
+    async def loads(self, session, s):
+        """
+        Load a json string into the database.
+        """
+        return await self.load_parsed(session, json.loads, s)
+
+    def _read(self, filename):
+        with open(filename) as f:
+            return json.load(f)
@@ -0,0 +1,114 @@
+"""
+An on-disk cache of parsed fixtures.
+
+Entries are pickled from_list data keyed by a hash of the fixture's content, the
+bootalchemy and PyYaml versions and the yaml loader class that parsed it, so a
+change to any of them is a cache miss rather than stale data.
+"""
+import os
+import pickle
+import hashlib
+import tempfile
+
+from . import __version__
+
+class FixtureCache(object):
+    """
+       Parsed Fixture Cache
+
+       *Arguments*
+          directory
+            where the cache files are kept.  Created if it does not exist.
+          max_size
+            total size in bytes the cache may grow to before the least recently used
+            entries are removed.  None for no limit.
+    """
+    suffix = '.pickle'
+
+    def __init__(self, directory, max_size=256*1024*1024):
+        self.directory = directory
+        self.max_size = max_size
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def key(self, content, parser=None):
+        """
+        returns the cache key for fixture content (bytes) parsed with the parser class.
+        """
+        import yaml
+        h = hashlib.sha1()
+        h.update(('%s:%s:%s.%s\n' % (__version__, yaml.__version__,
+                                     getattr(parser, '__module__', None),
+                                     getattr(parser, '__name__', None))).encode('utf-8'))
+        h.update(content)
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        """
+        returns the cached data for key, or None.  Unreadable entries count as misses.
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+        # mark the entry as recently used for eviction.
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        """
+        store data under key, then evict old entries if the cache is over max_size.
+        """
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path(key))
+        finally:
+            # only left behind when the write or the move failed.
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.evict()
+
+    def entries(self):
+        """
+        returns (mtime, size, path) for every entry, oldest first.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+        return entries
+
+    def evict(self):
+        if self.max_size is None:
+            return
+        entries = self.entries()
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        for mtime, size, path in self.entries():
+            os.remove(path)
@@ -0,0 +1,172 @@
+"""
+The bootalchemy command, which loads fixture files into a database::
+
+    bootalchemy --model myapp.model sqlite:///dev.db users.yaml groups.csv
+
+The loader is chosen by file extension: .yaml/.yml, .json, .ndjson/.jsonl, .csv
+(one class per file, named after the file) and .bin for compiled fixtures.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from .loader import YamlLoader, NdjsonLoader, CsvLoader
+from .compiled import CompiledLoader, loads as load_compiled
+from .stats import LoadStats
+from .formats import loaders
+
+# report names for the LoadStats phases.
+phases = (('parse', 'parse'), ('cast', 'check_types'), ('construct', 'create_obj'),
+          ('flush', 'flush'), ('write', 'write'))
+
+def report(stats, total, out):
+    for name, phase in phases:
+        out.write('%-10s %10.3fs\n' % (name, stats.times[phase]))
+    out.write('%-10s %10.3fs\n' % ('total', total))
+    out.write('%-10s %10d\n' % ('rows', stats.total_rows))
+    out.write('%-10s %10d\n' % ('flushes', stats.flushes))
+    out.write('%-10s %10d\n' % ('commits', stats.commits))
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='bootalchemy', description='Load fixture files into a database.')
+    parser.add_argument('url', help='sqlalchemy engine url')
+    parser.add_argument('fixtures', nargs='+', help='fixture files, loaded in order')
+    parser.add_argument('-m', '--model', action='append', required=True,
+                        help='module holding the model classes, may be repeated')
+    parser.add_argument('--bulk', action='store_true', help='insert flat rows with batched Core inserts')
+    parser.add_argument('--batch-size', type=int, default=1000, help='rows per bulk insert')
+    parser.add_argument('--preallocate-keys', action='store_true', help='assign integer primary keys before inserting')
+    parser.add_argument('--commit-interval', type=int, default=0,
+                        help='commit after every N groups, as well as at the end')
+    parser.add_argument('--flush-every', type=int, default=None, metavar='N',
+                        help='flush the session every N rows of a class block')
+    parser.add_argument('--commit-every', type=int, default=None, metavar='N',
+                        help='commit every N rows of a class block')
+    parser.add_argument('--expunge', action='store_true',
+                        help='remove loaded objects from the session after each flush or commit')
+    parser.add_argument('--compact-references', action='store_true',
+                        help='keep only the class and primary key of referenced objects once flushed')
+    parser.add_argument('--pipeline', type=int, default=0, metavar='N',
+                        help='parse and cast each file while it loads, up to N groups ahead')
+    parser.add_argument('--parallel', type=int, default=0,
+                        help='load independent groups in N worker processes')
+    parser.add_argument('--stats', action='store_true', help='print the time spent in each phase')
+    parser.add_argument('--profile', metavar='FILE', help='write a cProfile dump of the load to FILE')
+    return parser.parse_args(argv)
+
+def read_fixture(loader, filename):
+    """
+    returns the parsed contents of a fixture file, from_list data or a compiled artifact.
+    """
+    loader.source = filename
+    if isinstance(loader, CompiledLoader):
+        with open(filename, 'rb') as f:
+            return load_compiled(f.read())
+    if isinstance(loader, YamlLoader):
+        with open(filename) as f:
+            return loader.parse(f.read()) or []
+    if isinstance(loader, CsvLoader):
+        klass_name = os.path.splitext(os.path.basename(filename))[0]
+        with open(filename, newline='') as f:
+            return list(loader.iter_groups(f, klass_name))
+    if isinstance(loader, NdjsonLoader):
+        with open(filename) as f:
+            return list(loader.iter_groups(f))
+    with open(filename) as f:
+        return json.load(f) or []
+
+def load_fixture(loader, session, data, commit_interval):
+    """
+    load parsed fixture data, committing every commit_interval groups.  Returns the stats.
+    """
+    if isinstance(loader, CompiledLoader):
+        return loader.replay(session, data)
+    try:
+        if not commit_interval:
+            return loader.from_list(session, data)
+        stats = LoadStats()
+        for start in range(0, len(data), commit_interval):
+            stats.merge(loader.from_list(session, data[start:start + commit_interval]))
+            session.commit()
+            stats.commits += 1
+        return stats
+    finally:
+        loader.clear_positions()
+
+def timed_read(loader, filename, stats):
+    start = time.perf_counter()
+    try:
+        return read_fixture(loader, filename)
+    finally:
+        stats.times['parse'] += time.perf_counter() - start
+
+def get_loader_class(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in loaders:
+        raise SystemExit('bootalchemy: do not know how to load %s files (%s)' % (ext, filename))
+    return loaders[ext]
+
+def main(argv=None):
+    args = parse_args(argv)
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    options = dict(bulk=args.bulk, batch_size=args.batch_size, preallocate_keys=args.preallocate_keys)
+    if args.flush_every or args.commit_every or args.expunge:
+        options.update(flush_every=args.flush_every, commit_every=args.commit_every,
+                       expunge=args.expunge)
+    if args.compact_references:
+        options['compact_references'] = True
+    stats = LoadStats()
+    start = time.perf_counter()
+    profile = None
+    if args.profile:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+    try:
+        if args.parallel:
+            # multiprocessing is only imported when it is used.
+            from .parallel import ParallelLoader
+            parallel = ParallelLoader(args.model, processes=args.parallel, **options)
+            for filename in args.fixtures:
+                loader_class = get_loader_class(filename)
+                if loader_class is CompiledLoader:
+                    raise SystemExit('bootalchemy: compiled fixtures cannot be loaded in parallel (%s)' % filename)
+                data = timed_read(loader_class(args.model), filename, stats)
+                stats.merge(parallel.from_list(args.url, data))
+        else:
+            engine = create_engine(args.url)
+            session = sessionmaker(bind=engine)()
+            references = {}
+            for filename in args.fixtures:
+                loader_class = get_loader_class(filename)
+                if loader_class is CompiledLoader and args.bulk:
+                    raise SystemExit('bootalchemy: compiled fixtures cannot be loaded with --bulk (%s)' % filename)
+                if args.pipeline and not args.commit_interval and loader_class is not CompiledLoader:
+                    # the file is parsed while it loads.
+                    loader = loader_class(args.model, references=references, pipeline=args.pipeline, **options)
+                    stats.merge(loader.loadf(session, filename))
+                else:
+                    loader = loader_class(args.model, references=references, **options)
+                    data = timed_read(loader, filename, stats)
+                    stats.merge(load_fixture(loader, session, data, args.commit_interval))
+                references = loader._references
+            session.commit()
+            stats.commits += 1
+            session.close()
+            engine.dispose()
+    finally:
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(args.profile)
+    if args.stats:
+        report(stats, time.perf_counter() - start, sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+Compiled fixtures.
+
+compile_data turns from_list data into an artifact that can be replayed without
+parsing or casting: class names are replaced by indices into a class table,
+reference names by integer slots into a name table, and plain values are cast
+through the loader's cast plans at compile time.  dump and load write and read
+the artifact as a pickle behind a short header, and :class:`CompiledLoader`
+replays it into a session.
+
+An item is (reference slot or None, {key: value}, [(key, slot), ...] of the
+attribute references it defines, or None).  Values which are not plain are
+tuples, which yaml, json and csv never produce:
+
+(REF, slot)
+    a "*" reference.
+(DEFINE, slot, value)
+    an "&" attribute reference; value is what the attribute is given, None or ''.
+(NEST, class index, many, items)
+    nested "!" objects, a list of items if many and a single item otherwise.
+"""
+import pickle
+
+from .loader import Loader, parsers, perf_counter
+from .stats import LoadStats
+from .keys import KeyAllocator
+
+MAGIC = b'BOOTALCHEMY\x00'
+FORMAT_VERSION = 1
+
+REF, DEFINE, NEST = 0, 1, 2
+
+class CompileError(Exception):pass
+
+class Compiler(object):
+    """
+    Compiles from_list data using a loader's model and cast plans.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.classes = []
+        self.class_index = {}
+        self.slots = []
+        self.slot_index = {}
+
+    def klass(self, name):
+        if name not in self.class_index:
+            self.class_index[name] = len(self.classes)
+            self.classes.append(name)
+        return self.class_index[name]
+
+    def slot(self, name):
+        if name not in self.slot_index:
+            self.slot_index[name] = len(self.slots)
+            self.slots.append(name)
+        return self.slot_index[name]
+
+    def compile(self, data):
+        groups = []
+        for group in data:
+            blocks = []
+            controls = {}
+            for name, items in group.items():
+                if name in Loader.control_keys:
+                    controls[name] = items
+                    continue
+                klass = self.loader.get_klass(name)
+                blocks.append((self.klass(name), [self.item(klass, item) for item in items]))
+            groups.append((blocks, controls))
+        return (FORMAT_VERSION, self.classes, self.slots, groups)
+
+    def item(self, klass, values):
+        ref_slot = None
+        keys = list(values.keys())
+        if len(keys) == 1 and keys[0].startswith('&') and isinstance(values[keys[0]], dict):
+            ref_slot = self.slot(keys[0][1:])
+            values = values[keys[0]]
+        plan = {}
+        if self.loader.check_types:
+            plan = self.loader.cast_plan(klass)
+        encoded = {}
+        attribute_refs = []
+        for key, value in values.items():
+            entry = plan.get(key)
+            if isinstance(value, str) and value.startswith('&'):
+                slot = self.slot(value[1:])
+                attribute_refs.append((key, slot))
+                encoded[key] = (DEFINE, slot, '' if entry is not None and entry[1] else None)
+            elif entry is not None and self.loader._is_flat_value(value):
+                if value is None:
+                    encoded[key] = '' if entry[1] else None
+                elif entry[0] is not None:
+                    encoded[key] = entry[0](value)
+                else:
+                    encoded[key] = value
+            else:
+                encoded[key] = self.value(value)
+        return (ref_slot, encoded, attribute_refs or None)
+
+    def value(self, value):
+        if isinstance(value, str):
+            if value.startswith('&'):
+                return None
+            if value.startswith('*'):
+                return (REF, self.slot(value[1:]))
+        elif isinstance(value, dict):
+            keys = list(value.keys())
+            if len(keys) == 1 and keys[0].startswith('!'):
+                klass = self.loader.get_klass(keys[0][1:])
+                items = value[keys[0]]
+                if isinstance(items, dict):
+                    return (NEST, self.klass(keys[0][1:]), False, self.item(klass, items))
+                if isinstance(items, list):
+                    return (NEST, self.klass(keys[0][1:]), True, [self.item(klass, item) for item in items])
+                raise CompileError('You can only give a nested value a list or a dict. You tried to feed a %s into a %s.' %
+                    (items.__class__.__name__, keys[0][1:]))
+        elif isinstance(value, list):
+            return [self.value(list_item) for list_item in value]
+        elif isinstance(value, tuple):
+            raise CompileError('tuples cannot be compiled: %r' % (value,))
+        return value
+
+def compile_data(loader, data):
+    """
+    returns the compiled artifact for from_list data.
+    """
+    return Compiler(loader).compile(data)
+
+def dumps(artifact):
+    return MAGIC + pickle.dumps(artifact, pickle.HIGHEST_PROTOCOL)
+
+def loads(s):
+    if not s.startswith(MAGIC):
+        raise CompileError('not a compiled bootalchemy fixture')
+    artifact = pickle.loads(s[len(MAGIC):])
+    if artifact[0] != FORMAT_VERSION:
+        raise CompileError('compiled fixture format %s is not supported, recompile it' % artifact[0])
+    return artifact
+
+def compile_file(loader, source, target, yaml_loader=None):
+    """
+    compile the yaml file source into target, using loader's model and casts.
+    """
+    with open(source) as f:
+        data = parsers().load(f.read(), Loader=yaml_loader or parsers().DefaultYamlLoader)
+    artifact = compile_data(loader, data or [])
+    with open(target, 'wb') as f:
+        f.write(dumps(artifact))
+    return artifact
+
+class CompiledLoader(Loader):
+    """
+       Loads compiled fixtures, see :func:`compile_file`.  Compiled values are
+       already cast, so check_types only matters when compiling.  Every row is added
+       through the session, so the bulk, merge and incremental options are refused.
+    """
+
+    def __init__(self, model, *args, **kw):
+        Loader.__init__(self, model, *args, **kw)
+        for option in ('bulk', 'merge', 'incremental'):
+            if getattr(self, option):
+                raise ValueError('CompiledLoader does not support %s' % option)
+
+    def loadf(self, session, filename):
+        """
+        Load a compiled fixture file by filename.
+        """
+        self.source = filename
+        with open(filename, 'rb') as f:
+            return self.loads(session, f.read())
+
+    def loads(self, session, s):
+        """
+        Load a compiled fixture from bytes.
+        """
+        start = perf_counter()
+        artifact = loads(s)
+        stats = self.replay(session, artifact)
+        stats.times['parse'] += perf_counter() - start
+        return stats
+
+    def replay(self, session, artifact):
+        """
+        insert the contents of a compiled artifact, as from_list would for its source.
+        Returns the stats.
+        """
+        version, class_names, self._slot_names, groups = artifact
+        self.session = session
+        if self.compact_references:
+            self._references.session = session
+        if self.preallocate_keys:
+            self._key_allocator = KeyAllocator(session, self.preallocate_keys)
+        stats = self.stats = LoadStats()
+        flushes_saved = self.flushes_saved
+        klass = None
+        item = None
+        try:
+            self._classes = [self.get_klass(name) for name in class_names]
+            for group_index, (blocks, controls) in enumerate(groups):
+                self.fire('group_start', group_index, blocks)
+                for index, items in blocks:
+                    klass = self._classes[index]
+                    self.fire('class_start', klass, items)
+                    for item in items:
+                        self.add_compiled(klass, item)
+                        self.end_rows()
+                    self.fire('class_end', klass, items)
+                self.end_group(controls)
+                stats.groups += 1
+                self.fire('group_end', group_index, blocks)
+            self.set_deferred_references()
+        except AttributeError as e:
+            self.log_error(e, None, klass, item)
+        except Exception as e:
+            self.log_error(e, None, klass, item)
+            raise
+        self.session = None
+        self._key_allocator = None
+        stats.flushes_saved = self.flushes_saved - flushes_saved
+        return stats
+
+    def add_compiled(self, klass, item):
+        ref_slot, values, attribute_refs = item
+        resolved_values = {}
+        for key, value in values.items():
+            resolved_values[key] = self.resolve_compiled(value)
+        start = perf_counter()
+        obj = self.create_obj(klass, resolved_values)
+        self.stats.times['create_obj'] += perf_counter() - start
+        self.stats.add_rows(klass)
+        if self._key_allocator is not None:
+            self._key_allocator.allocate(klass, obj)
+        self.session.add(obj)
+
+        if ref_slot is not None:
+            self.add_reference('&' + self._slot_names[ref_slot], obj)
+        if attribute_refs:
+            self.store_references(obj, dict((key, '&' + self._slot_names[slot])
+                                            for key, slot in attribute_refs))
+        return obj
+
+    def resolve_compiled(self, value):
+        if type(value) is tuple:
+            tag = value[0]
+            if tag == REF:
+                name = self._slot_names[value[1]]
+                if name in self._deferred_names:
+                    self.set_deferred_references()
+                if name not in self._references:
+                    raise Exception('The pointer *%(val)s could not be found. Make sure that *%(val)s is declared before it is used.' % { 'val': name })
+                return self._references[name]
+            if tag == DEFINE:
+                return value[2]
+            klass = self._classes[value[1]]
+            self._nesting += 1
+            try:
+                if value[2]:
+                    return [self.add_compiled(klass, item) for item in value[3]]
+                return self.add_compiled(klass, value[3])
+            finally:
+                self._nesting -= 1
+        if type(value) is list:
+            return [self.resolve_compiled(list_item) for list_item in value]
+        return value
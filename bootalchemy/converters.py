@@ -24,9 +24,12 @@ SOFTWARE.
 """
 
 import re, datetime
+from functools import lru_cache
 
 class ConverterError(Exception):pass
 
+_missing = object()
+
 timestamp_regexp = re.compile(
         r'''^(?P<year>[0-9][0-9][0-9][0-9])
             -(?P<month>[0-9][0-9]?)
@@ -39,7 +42,49 @@ timestamp_regexp = re.compile(
             (?:[ \t]*(?P<tz>Z|(?P<tz_sign>[-+])(?P<tz_hour>[0-9][0-9]?)
             (?::(?P<tz_minute>[0-9][0-9]))?))?)?$''', re.X)
             
+def _fast_timestamp(value):
+    """
+    the result of timestamp for the common ISO 8601 forms, using fromisoformat,
+    or None for anything else.  Only forms the regular expression reads the same
+    way are let through, as fromisoformat accepts some it does not.
+    """
+    size = len(value)
+    if size < 10 or value[4] != '-' or value[7] != '-':
+        return None
+    if size == 10:
+        return datetime.date.fromisoformat(value)
+    if size < 19 or value[10] not in 'Tt ' or value[13] != ':' or value[16] != ':':
+        return None
+    end = 19
+    if size > 19 and value[19] == '.':
+        end = 20
+        while end < size and value[end].isdigit():
+            end += 1
+        if end - 20 not in (3, 6):
+            return None
+    tz = value[end:]
+    if tz == '' or tz == 'Z':
+        offset = None
+    elif len(tz) == 6 and tz[0] in '+-' and tz[3] == ':':
+        offset = tz
+    else:
+        return None
+    data = datetime.datetime.fromisoformat(value[:10] + 'T' + value[11:end] + (offset or ''))
+    if offset is not None:
+        data = data.replace(tzinfo=None) - data.utcoffset()
+    return data
+
 def timestamp(value):
+    """
+    convert a YAML timestamp to a date, or to a naive datetime in UTC if it has a
+    time zone offset.
+    """
+    try:
+        data = _fast_timestamp(value)
+    except (TypeError, ValueError):
+        data = None
+    if data is not None:
+        return data
     match = timestamp_regexp.match(value)
     if match is None:
         raise ConverterError('Unknown DateTime format, %s try %%Y-%%m-%%d %%h:%%m:%%s.d'%value)
@@ -76,7 +121,26 @@ timeonly_regexp = re.compile(
             (?::(?P<second>[0-9][0-9]))?
             (?:\.(?P<fraction>[0-9]*))?$''', re.X)
 
+_time_shapes = dict((len(shape), shape) for shape in ('00:00', '00:00:00', '00:00:00.000000'))
+
+def _has_shape(value, shape):
+    for char, expected in zip(value, shape):
+        if expected == '0':
+            if not '0' <= char <= '9':
+                return False
+        elif char != expected:
+            return False
+    return True
+
 def timeonly(value):
+    """
+    convert HH:MM[:SS[.ffffff]] to a time.
+    """
+    try:
+        if len(value) in _time_shapes and _has_shape(value, _time_shapes[len(value)]):
+            return datetime.time.fromisoformat(value)
+    except (TypeError, ValueError):
+        pass
     match = timeonly_regexp.match(value)
     if match is None:
         raise ConverterError('Unknown Time format, %s try HH:MM:SS.dddddd'%value)
@@ -92,4 +156,43 @@ def timeonly(value):
         while len(fraction) < 6:
             fraction += '0'
         fraction = int(fraction)
-    return datetime.time(hour, minute, second, fraction)
\ No newline at end of file
+    return datetime.time(hour, minute, second, fraction)
+
+def memoize(converter, maxsize=4096):
+    """
+    returns converter with a least recently used memo of maxsize values, for
+    columns where the same strings come up again and again.  Values which can
+    not be hashed are converted every time.
+    """
+    cached = lru_cache(maxsize=maxsize, typed=True)(converter)
+    def convert(value):
+        try:
+            hash(value)
+        except TypeError:
+            return converter(value)
+        return cached(value)
+    convert.cache_info = cached.cache_info
+    convert.cache_clear = cached.cache_clear
+    convert.__wrapped__ = converter
+    return convert
+
+def convert_column(converter, values):
+    """
+    returns the list of converter applied to every item of values, converting
+    each distinct value once.  None is kept as it is.
+    """
+    seen = {}
+    result = []
+    for value in values:
+        if value is None:
+            result.append(None)
+            continue
+        try:
+            converted = seen.get(value, _missing)
+        except TypeError:
+            result.append(converter(value))
+            continue
+        if converted is _missing:
+            converted = seen[value] = converter(value)
+        result.append(converted)
+    return result
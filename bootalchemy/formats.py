@@ -0,0 +1,15 @@
+"""
+The loader for each fixture file extension, as used by the bootalchemy command
+and by fixture snapshots.
+"""
+from .loader import YamlLoader, JsonLoader, NdjsonLoader, CsvLoader
+from .compiled import CompiledLoader
+
+loaders = {'.yaml': YamlLoader,
+           '.yml': YamlLoader,
+           '.json': JsonLoader,
+           '.ndjson': NdjsonLoader,
+           '.jsonl': NdjsonLoader,
+           '.csv': CsvLoader,
+           '.bin': CompiledLoader,
+           }
@@ -0,0 +1,213 @@
+"""
+Incremental reloading of fixtures.
+
+With Loader(incremental=True) every top level group that is loaded gets a row in
+the bootalchemy_group table holding a fingerprint of its content, a hash of the
+groups it took references from and the references it defined.  When the same
+source is loaded again, a group whose fingerprint and upstream groups are all
+unchanged is skipped, and the references it defined are restored from that row;
+objects with one query per class, anything else as it was stored.  The references
+are stored as JSON, so only plain values (strings, numbers, booleans and None) and
+objects with such primary keys can be restored; a group defining anything else is
+loaded again every time.
+
+A group which did change is loaded again in merge mode, which incremental implies,
+so its rows need natural keys (see :class:`bootalchemy.loader.Loader`) for the rows
+already in the database to be updated rather than inserted again.
+
+A group is found again by its content, so moving groups around does not reload
+them.  Rows of groups which were removed from a source are left in the table, and
+deleting the rows of a source makes its next load a full one.
+"""
+import json
+import hashlib
+import datetime
+
+from sqlalchemy import Table, Column, MetaData, Unicode, String, Integer, DateTime, Text, and_, tuple_
+from sqlalchemy.orm import object_mapper, class_mapper
+from sqlalchemy.orm.exc import UnmappedInstanceError
+
+metadata = MetaData()
+
+# the reference values that are stored, and restored as they were.
+plain_types = (type(None), bool, int, float, str)
+
+group_table = Table('bootalchemy_group', metadata,
+    Column('source', Unicode(255), primary_key=True),
+    Column('fingerprint', String(40), primary_key=True),
+    Column('occurrence', Integer, primary_key=True, autoincrement=False),
+    Column('upstream', String(40), nullable=False),
+    Column('refs', Text),
+    Column('loaded', DateTime),
+)
+
+def fingerprint(group):
+    """
+    returns a hash of the content of group.
+    """
+    try:
+        content = json.dumps(group, sort_keys=True, default=repr)
+    except TypeError:
+        # keys that do not sort against each other
+        content = repr(group)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+class GroupState(object):
+    """
+       What the tracker knows about one group of the current load.
+
+       *Attributes*
+          key
+            (fingerprint, occurrence) of the group, occurrence counting groups with
+            the same content.
+          upstream
+            hash of the references the group uses and the groups that define them.
+          defined
+            names of the references the group defines.
+          record
+            (upstream, references as JSON) stored for key, or None.
+          skip
+            True if the group is unchanged and does not need to be loaded.
+    """
+
+    def __init__(self, key, upstream, defined, record, skip):
+        self.key = key
+        self.upstream = upstream
+        self.defined = defined
+        self.record = record
+        self.skip = skip
+
+class GroupTracker(object):
+    """
+       Keeps the bootalchemy_group rows of one source during a load.
+
+       *Arguments*
+          loader
+            the Loader doing the load, whose references are read and restored.
+          session
+            the session of the load.  The rows are written in its transaction.
+          source
+            name the rows are kept under, the file name for loadf.
+    """
+
+    def __init__(self, loader, session, source):
+        self.loader = loader
+        self.session = session
+        self.source = source
+        group_table.create(bind=session.connection(), checkfirst=True)
+        rows = session.execute(group_table.select().where(group_table.c.source == source))
+        self.records = dict(((row.fingerprint, row.occurrence), (row.upstream, row.refs)) for row in rows)
+        self.occurrences = {}
+
+    def check(self, group):
+        """
+        returns the GroupState of the next group of the load.
+        """
+        # imported here as loader imports this module
+        from .loader import scan_references
+        fp = fingerprint(group)
+        occurrence = self.occurrences.get(fp, 0)
+        self.occurrences[fp] = occurrence + 1
+        key = (fp, occurrence)
+
+        defined, used = set(), set()
+        scan_references(group, defined, used)
+        loader = self.loader
+        if (used - defined) & loader._deferred_names:
+            loader.set_deferred_references()
+        # the references as they are now; a group upstream that was loaded again
+        # has defined new objects, which makes this group load again as well.
+        deps = [(name, self._spec(loader._references.get(name))) for name in sorted(used - defined)]
+        upstream = hashlib.sha1(repr(deps).encode('utf-8')).hexdigest()
+
+        record = self.records.get(key)
+        skip = record is not None and record[0] == upstream and self._decode(record[1]) is not None
+        return GroupState(key, upstream, defined, record, skip)
+
+    def _decode(self, refs):
+        """
+        returns the [name, kind, value] references of a row, or None if they cannot
+        be restored.
+        """
+        if refs is None:
+            return None
+        try:
+            # tables made by older versions hold the JSON as bytes.
+            return json.loads(refs)
+        except ValueError:
+            # written by an older version, or not by bootalchemy
+            return None
+
+    def restore(self, state):
+        """
+        put the references a skipped group defined back into the loader.
+        """
+        loader = self.loader
+        refs = self._decode(state.record[1])
+        keys = {}
+        for name, kind, value in refs:
+            if kind == 'object':
+                keys.setdefault(value[0], set()).add(tuple(value[1]))
+        objects = {}
+        for klass_name, pks in keys.items():
+            objects[klass_name] = self._fetch(loader.get_klass(klass_name), pks)
+        for name, kind, value in refs:
+            if kind == 'object':
+                value = objects[value[0]].get(tuple(value[1]))
+            loader._references[name] = value
+            loader.stored_reference(name, value)
+
+    def _fetch(self, klass, pks):
+        """
+        returns {primary key: object} for the rows of klass with the primary keys pks,
+        fetched with one query.
+        """
+        mapper = class_mapper(klass)
+        if len(mapper.primary_key) == 1:
+            criterion = mapper.primary_key[0].in_([pk[0] for pk in pks])
+        else:
+            criterion = tuple_(*mapper.primary_key).in_(list(pks))
+        return dict((tuple(mapper.primary_key_from_instance(obj)), obj)
+                    for obj in self.session.query(klass).filter(criterion))
+
+    def _spec(self, value):
+        try:
+            mapper = object_mapper(value)
+        except UnmappedInstanceError:
+            return ('value', value)
+        pk = mapper.primary_key_from_instance(value)
+        if None in pk:
+            self.loader.flush_session()
+            pk = mapper.primary_key_from_instance(value)
+        return ('object', (mapper.class_.__name__, tuple(pk)))
+
+    def record(self, state):
+        """
+        store the row of a group that was just loaded.
+        """
+        loader = self.loader
+        if state.defined & loader._deferred_names:
+            loader.set_deferred_references()
+        references = loader._references
+        refs = []
+        for name in sorted(state.defined):
+            if name in references:
+                kind, value = self._spec(references[name])
+                refs.append([name, kind, value])
+        try:
+            if any(kind == 'value' and not isinstance(value, plain_types) for name, kind, value in refs):
+                raise TypeError
+            refs = json.dumps(refs, allow_nan=False)
+        except (TypeError, ValueError):
+            # a value JSON cannot hold; the group is loaded again next time.
+            refs = None
+        fp, occurrence = state.key
+        values = dict(upstream=state.upstream, refs=refs, loaded=datetime.datetime.now())
+        if state.record is not None:
+            self.session.execute(group_table.update().where(and_(group_table.c.source == self.source,
+                                                                 group_table.c.fingerprint == fp,
+                                                                 group_table.c.occurrence == occurrence)),
+                                 values)
+        else:
+            self.session.execute(group_table.insert(), dict(values, source=self.source, fingerprint=fp,
+                                                            occurrence=occurrence))
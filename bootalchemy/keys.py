@@ -0,0 +1,148 @@
+"""
+Client side allocation of integer primary keys.
+
+Objects which already have their primary key when they are added to the session
+can have their references read without a flush, and the ORM can insert a whole
+block of them with one executemany.
+"""
+from sqlalchemy import Integer, Sequence, func, text
+from sqlalchemy.orm import class_mapper
+
+class KeyAllocator(object):
+    """
+       Hands out primary keys for mapped classes with a single integer primary key.
+
+       Tables with a sequence (an explicit Sequence default, or a serial column on
+       PostgreSQL) have block_size values reserved from the sequence per round trip,
+       on databases which have sequences.  Other tables read MAX(pk) once and count up from there, which is only safe
+       while nothing else inserts into the table during the load.
+
+       *Arguments*
+          session
+            the session keys are allocated for.
+          block_size
+            number of sequence values reserved at a time.
+    """
+
+    def __init__(self, session, block_size=100):
+        self.session = session
+        self.block_size = block_size
+        self._columns = {}
+        self._counters = {}
+        self._reserved = {}
+
+    def key_column(self, klass):
+        """
+        returns (attribute key, column) of the primary key allocated for klass, or None
+        if the class does not have a single autoincrementing integer primary key.
+        """
+        if klass in self._columns:
+            return self._columns[klass]
+        result = None
+        mapper = class_mapper(klass)
+        if len(mapper.primary_key) == 1:
+            column = mapper.primary_key[0]
+            if isinstance(column.type, Integer) and column.autoincrement in (True, 'auto') \
+                    and not column.foreign_keys:
+                prop = mapper.get_property_by_column(column)
+                result = (prop.key, column)
+        self._columns[klass] = result
+        return result
+
+    def _sequence_name(self, column):
+        if not self.session.bind.dialect.supports_sequences:
+            return None
+        if isinstance(column.default, Sequence):
+            if column.default.schema:
+                return '%s.%s' % (column.default.schema, column.default.name)
+            return column.default.name
+        if self.session.bind.dialect.name == 'postgresql':
+            table = column.table.fullname
+            return self.session.execute(text('select pg_get_serial_sequence(:table, :column)'),
+                                        {'table': table, 'column': column.name}).scalar()
+        return None
+
+    def _counter(self, column):
+        """
+        returns (sequence name, None) or (None, last key counted) for the table of the
+        primary key column, looking them up the first time.
+        """
+        table = column.table
+        if table not in self._counters:
+            # the object a key is wanted for can already be in the session, through a
+            # backref cascade; autoflush would insert it with a key of the database's.
+            with self.session.no_autoflush:
+                sequence = self._sequence_name(column)
+                if sequence is None:
+                    counter = self.session.query(func.max(column)).scalar() or 0
+            if sequence is None:
+                self._counters[table] = (None, counter)
+            else:
+                self._counters[table] = (sequence, None)
+                self._reserved[table] = []
+        return self._counters[table]
+
+    def next_key(self, column):
+        """
+        returns the next key for the primary key column.
+        """
+        table = column.table
+        sequence, counter = self._counter(column)
+        if sequence is None:
+            counter += 1
+            self._counters[table] = (None, counter)
+            return counter
+        reserved = self._reserved[table]
+        if not reserved:
+            with self.session.no_autoflush:
+                rows = self.session.execute(text('select nextval(:sequence) from generate_series(1, :n)'),
+                                            {'sequence': sequence, 'n': self.block_size}).fetchall()
+            reserved.extend(sorted((row[0] for row in rows), reverse=True))
+        return reserved.pop()
+
+    def observe(self, column, value):
+        """
+        note a key given explicitly in the data, so counted keys skip past it.
+        """
+        if not isinstance(value, int):
+            return
+        # the counter starts at MAX(pk) even when no key has been counted yet, as the
+        # object holding value may not have been flushed.
+        sequence, counter = self._counter(column)
+        if sequence is None and value > counter:
+            self._counters[column.table] = (None, value)
+
+    def allocate(self, klass, obj):
+        """
+        give obj a primary key unless it has one.  Returns the key, or None when the
+        class is not one keys are allocated for.
+        """
+        key_column = self.key_column(klass)
+        if key_column is None:
+            return None
+        key, column = key_column
+        value = getattr(obj, key, None)
+        if value is not None:
+            self.observe(column, value)
+            return value
+        value = self.next_key(column)
+        setattr(obj, key, value)
+        return value
+
+    def allocate_row(self, klass, row):
+        """
+        give a bulk mode row, a dict of column keys to values, a primary key unless it
+        has one.  Returns the key, or None when the class is not one keys are
+        allocated for.
+        """
+        key_column = self.key_column(klass)
+        if key_column is None:
+            return None
+        column = key_column[1]
+        value = row.get(column.key)
+        if value is not None:
+            self.observe(column, value)
+            return value
+        value = self.next_key(column)
+        row[column.key] = value
+        return value
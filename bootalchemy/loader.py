@@ -1,27 +1,88 @@
-from yaml import load
 import sys
+import os
+import time
+import csv
+import json
 import logging
-from pprint import pformat
-from .converters import timestamp, timeonly
+import reprlib
+import importlib
+import threading
+from array import array
+from .converters import timestamp, timeonly, memoize, convert_column
+from .cache import FixtureCache
+from .keys import KeyAllocator
+from .writers import get_writer
+from .stats import LoadStats
+from .incremental import GroupTracker
+from .references import ReferenceStore
+from .registry import ClassRegistry
+from .pipeline import Pipeline, ProcessGroups
 from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm.exc import UnmappedClassError
 from sqlalchemy import Unicode, Date, DateTime, Time, Integer, Float, Boolean, String
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy import tuple_
 try:
     from sqlalchemy.exc import IntegrityError
 except ImportError:
     from sqlalchemy.exceptions import IntegrityError
 from functools import partial
 
-log = logging.Logger('bootalchemy', level=logging.INFO)
-ch = logging.StreamHandler()
-ch.setLevel(logging.DEBUG)
-log.addHandler(ch)
+log = logging.getLogger('bootalchemy')
 
-# Support for SQLAlchemy 0.5 while 0.6 is in beta. This will be removed in future versions.
-try:
-    from sqlalchemy.dialects.postgresql.base import PGArray
-except ImportError:
-    log.error('You really should upgrade to SQLAlchemy=>0.6 to get the full bootalchemy experience')
-    PGArray = None
+perf_counter = time.perf_counter
+
+# shortens the items and references log_error reports.
+_short = reprlib.Repr()
+_short.maxlevel = 3
+_short.maxdict = _short.maxlist = _short.maxtuple = _short.maxset = 10
+_short.maxstring = _short.maxother = 80
+
+# most references log_error reports, and longest error message.
+max_logged_references = 10
+max_logged_message = 1000
+
+# names which used to live here and are now imported from the modules that need
+# yaml or a dialect only when they are first used.
+_parser_names = ('load', 'SafeFixtureLoader', 'CSafeFixtureLoader', 'DefaultYamlLoader',
+                 'CSafeLoader', 'CParser', 'construct_python_str')
+
+_parsers = None
+
+def parsers():
+    """
+    returns the :mod:`bootalchemy.parsers` module, importing PyYaml the first time.
+    """
+    global _parsers
+    if _parsers is None:
+        _parsers = importlib.import_module('bootalchemy.parsers')
+    return _parsers
+
+def __getattr__(name):
+    if name in _parser_names:
+        return getattr(parsers(), name)
+    if name == 'PGArray':
+        from sqlalchemy.dialects.postgresql import ARRAY
+        return ARRAY
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+def scan_references(value, defined, used):
+    """
+    collect the names of the references defined ("&") and used ("*") in value.
+    """
+    if isinstance(value, str):
+        if value.startswith('&'):
+            defined.add(value[1:])
+        elif value.startswith('*'):
+            used.add(value[1:])
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(key, str) and key.startswith('&'):
+                defined.add(key[1:])
+            scan_references(item, defined, used)
+    elif isinstance(value, list):
+        for item in value:
+            scan_references(item, defined, used)
 
 class Loader(object):
     """
@@ -29,13 +90,81 @@ class Loader(object):
 
        *Arguments*
           model
-            list of classes in your model.
+            the module, or list of modules, holding the classes in your model.  Module
+            names and declarative bases may be given too (see
+            :class:`bootalchemy.registry.ClassRegistry`), and fixtures can name a class
+            module.Class when two modules have one of the same name.
           references
             references from an sqlalchemy session to initialize with.
           check_types
             introspect the target model class to re-cast the data appropriately.
+          bulk
+            insert rows which carry no references, nesting or relationship values with
+            batched Core inserts instead of building ORM objects.  Those rows are not
+            added to the session and no ORM events fire for them.
+          batch_size
+            number of rows per Core insert statement in bulk mode.
+          writer
+            how bulk mode inserts its batches: a :class:`bootalchemy.writers.Writer`, or a
+            dict of dialect names to writers.  Defaults to an ExecuteManyWriter.
+          class_writers
+            dict of classes, or class names, to the writer used for their rows.
+          merge
+            update rows which are already in the database instead of inserting them
+            again.  Rows are matched on their natural key, looked up batch_size rows
+            at a time, and only changed attributes are written.  This applies to the
+            class blocks of a group; nested objects are always inserted.  Cannot be
+            combined with bulk.
+          natural_keys
+            dict of classes, or class names, to the tuple of attributes which identify
+            their rows in merge mode.  Classes not given here use their
+            __natural_key__ attribute if they have one, and their primary key otherwise.
+          preallocate_keys
+            give objects with a single integer primary key their key before they are
+            added to the session (see :class:`bootalchemy.keys.KeyAllocator`), so that
+            references to them need no flush.  Bulk mode rows get their keys the same
+            way.  The value is the number of sequence values reserved per round trip,
+            or True for 100.
+          incremental
+            record a fingerprint of every group loaded in the bootalchemy_group table,
+            and skip the groups of a later load of the same source whose content and
+            upstream references are unchanged (see :mod:`bootalchemy.incremental`).
+            The references a skipped group defines are restored from the database.
+            Groups are told apart by source and content, so a load split over several
+            from_list calls should give each part its own source.  Implies merge, so
+            that a group which changed updates the rows it loaded before.
+          compact_references
+            keep references in a :class:`bootalchemy.references.ReferenceStore`, which
+            holds just the class and primary key of an object once it has been flushed
+            and loads it from the session when a "*" value uses it.  A reference used
+            for a foreign key column is given the primary key itself.
+          flush_every
+            flush the session after every flush_every rows of a class block, nested
+            objects not counted, as if the fixture had a flush key there.
+          commit_every
+            commit after every commit_every rows of a class block.
+          expunge
+            remove the objects from the session after each of those flushes and
+            commits, so that the session does not grow with the block.  Top level
+            blocks then do not collect their objects either.  Best used with
+            compact_references, as references to expunged objects are loaded again.
+          memo_size
+            remember the last memo_size converted values of each date, datetime and
+            time conversion, for columns which repeat the same values a lot.
+          pipeline
+            parse and cast the groups of streamed loads on threads of their own while
+            the loading thread writes the groups before them (see
+            :mod:`bootalchemy.pipeline`).  The value is the most groups waiting
+            between two stages, or True for 8.  Lists of groups load as before.
     """
     default_encoding = 'utf-8'
+    # casts for dialect specific types, as (module, type name, cast function), added
+    # to default_casts when a column of the dialect is first seen.
+    dialect_casts = {'postgresql': [('sqlalchemy.dialects.postgresql', 'ARRAY', list)]}
+    control_keys = ('flush', 'commit', 'clear')
+    # chunks whose positions a streamed load keeps, enough for those in a pipeline.
+    kept_positions = 64
+    events = ('group_start', 'group_end', 'class_start', 'class_end', 'flush', 'commit', 'reference')
 
     def cast(self, type_, cast_func, value):
         if type(value) == type_:
@@ -43,7 +172,10 @@ class Loader(object):
         else:
             return cast_func(value)
 
-    def __init__(self, model, references=None, check_types=True):
+    def __init__(self, model, references=None, check_types=True, bulk=False, batch_size=1000,
+                 preallocate_keys=False, writer=None, class_writers=None, merge=False, natural_keys=None,
+                 incremental=False, compact_references=False, flush_every=None, commit_every=None,
+                 expunge=False, memo_size=None, pipeline=False):
         self.default_casts = {Integer:int,
                               Unicode: partial(self.cast, str, lambda x: str(x, self.default_encoding)),
                               Date: timestamp, 
@@ -52,33 +184,155 @@ class Loader(object):
                               Float:float,
                               Boolean: partial(self.cast, bool, lambda x: x.lower() not in ('f', 'false', 'no', 'n'))
                               }
-        if PGArray:
-            self.default_casts[PGArray] = list
+        if memo_size:
+            for type_ in (Date, DateTime, Time):
+                self.default_casts[type_] = memoize(self.default_casts[type_], memo_size)
                               
         self.source = 'UNKNOWN'
         self.model = model
-        if references is None:
-            self._references = {}
-        else:
-            self._references = references
+        self.compact_references = compact_references
+        self._references = self.new_references(references)
 
-        if not isinstance(model, list):
-            model = [model]
+        self.check_types = check_types
+        self.bulk = bulk
+        self.batch_size = batch_size
+        self.writer = writer
+        self.class_writers = class_writers or {}
+        # a changed group is loaded again over the rows it loaded before.
+        merge = merge or bool(incremental)
+        if merge and bulk:
+            raise ValueError('merge and bulk cannot be used together: merged rows go through the session')
+        self.merge = merge
+        self.natural_keys = natural_keys or {}
+        self.incremental = incremental
+        self.flush_every = flush_every
+        self.commit_every = commit_every
+        self.expunge = expunge
+        self._unflushed = 0
+        self._uncommitted = 0
+        self._pending = None
+        self._pending_keys = None
+        self._deferred = []
+        self._deferred_names = set()
+        self._nesting = 0
+        self.reference_flushes = 0
+        self.flushes_saved = 0
+        if preallocate_keys is True:
+            preallocate_keys = 100
+        self.preallocate_keys = preallocate_keys
+        self._key_allocator = None
+        if pipeline is True:
+            pipeline = 8
+        self.pipeline = pipeline
+        self._precast = False
+        self._positioned = False
+        self._cast_lock = threading.Lock()
+        self._listeners = {}
+        self._positions = {}
+        self._failed = None
+        self._failed_row = None
+        self._failed_index = None
+        self.stats = LoadStats()
 
-        self.modules = []
-        for item in model:
-            if isinstance(item, str):
-                self.modules.append(__import__(item))
-            else:
-                self.modules.append(item)
+    def _get_model(self):
+        return self._model
 
-        self.check_types = check_types
+    def _set_model(self, model):
+        self._model = model
+        # modules are imported, and classes looked up, when a name is first used.
+        self.registry = ClassRegistry(model)
+
+        # cast and bulk plans are derived from the model, so they go with it.
+        self._cast_plans = {}
+        self._bulk_plans = {}
+        self._foreign_keys = {}
+        self._dialects = set()
+
+    model = property(_get_model, _set_model)
+
+    @property
+    def modules(self):
+        return self.registry.modules
+
+    def listen(self, event, callback):
+        """
+        call callback when event happens.  The events and their arguments are:
+
+        group_start, group_end
+            (index, group) for each group of the data.
+        class_start, class_end
+            (klass, items) for each class block of a group.
+        flush, commit
+            () after the loader flushed or committed the session.
+        reference
+            (name, value) when a reference is stored.
+        """
+        if event not in self.events:
+            raise ValueError('Unknown event %s, try one of %s' % (event, ', '.join(self.events)))
+        self._listeners.setdefault(event, []).append(callback)
+
+    def fire(self, event, *args):
+        listeners = self._listeners.get(event)
+        if listeners:
+            for callback in listeners:
+                callback(*args)
+
+    def flush_session(self):
+        start = perf_counter()
+        self.session.flush()
+        self._unflushed = 0
+        if self.compact_references:
+            self._references.compact()
+        self.stats.times['flush'] += perf_counter() - start
+        self.stats.flushes += 1
+        self.fire('flush')
+
+    def commit_session(self):
+        self.session.commit()
+        self._unflushed = self._uncommitted = 0
+        if self.compact_references:
+            self._references.compact()
+        self.stats.commits += 1
+        self.fire('commit')
+
+    def stored_reference(self, name, value):
+        """
+        called for every reference stored, to keep count and tell the listeners.
+        """
+        if len(self._references) > self.stats.peak_references:
+            self.stats.peak_references = len(self._references)
+        if self._listeners:
+            self.fire('reference', name, value)
 
     def clear(self):
         """
         clear the existing references
         """
-        self._references = {}
+        self._references = self.new_references()
+        self._deferred = []
+        self._deferred_names = set()
+
+    def new_references(self, references=None):
+        """
+        returns the mapping references are kept in, starting with references.
+        """
+        if self.compact_references:
+            return ReferenceStore(references)
+        if references is None:
+            return {}
+        return references
+
+    def foreign_keys(self, klass):
+        """
+        returns the attribute names of the foreign key columns of klass.
+        """
+        keys = self._foreign_keys.get(klass)
+        if keys is None:
+            mapper = class_mapper(klass)
+            keys = self._foreign_keys[klass] = frozenset(
+                prop.key for prop in mapper.column_attrs
+                if len(prop.columns) == 1 and prop.columns[0].foreign_keys)
+        return keys
 
     def create_obj(self, klass, item):
         """
@@ -88,15 +342,12 @@ class Loader(object):
         try:
             obj = klass(**item)
         except TypeError as e:
-            self.log_error(e, None, klass, item)
             raise TypeError("The class, %s, cannot be given the items %s. Original Error: %s" %
                 (klass.__name__, str(item), str(e)))
         except AttributeError as e:
-            self.log_error(e, None, klass, item)
             raise AttributeError("Object creation failed while initializing a %s with the items %s. Original Error: %s" %
                 (klass.__name__, str(item), str(e)))
         except KeyError as e:
-            self.log_error(e, None, klass, item)
             raise KeyError("On key, %s, failed while initializing a %s with the items %s. %s.keys() = %s" %
                 (str(e), klass.__name__, str(item), klass.__name__, str(list(klass.__dict__.keys()))))
 
@@ -114,6 +365,8 @@ class Loader(object):
             if value.startswith('&'):
                 return None
             elif value.startswith('*'):
+                if value[1:] in self._deferred_names:
+                    self.set_deferred_references()
                 if value[1:] in self._references:
                     return self._references[value[1:]]
                 else:
@@ -125,12 +378,18 @@ class Loader(object):
                 items = value[keys[0]]
                 klass = self.get_klass(klass_name)
 
-                if isinstance(items, dict):
-                    return self.add_klass_with_values(klass, items)
-                elif isinstance(items, list):
-                    return self.add_klasses(klass, items)
-                else:
-                    raise TypeError('You can only give a nested value a list or a dict. You tried to feed a %s into a %s.' %
+                self._nesting += 1
+                try:
+                    if isinstance(items, dict):
+                        return self.add_klass_with_values(klass, items)
+                    elif isinstance(items, list):
+                        return self.add_klasses(klass, items)
+                except Exception:
+                    self.record_failure(klass, items)
+                    raise
+                finally:
+                    self._nesting -= 1
+                raise TypeError('You can only give a nested value a list or a dict. You tried to feed a %s into a %s.' %
                         (items.__class__.__name__, klass_name))
         elif isinstance(value, list):
             return [self.resolve_value(list_item) for list_item in value]
@@ -138,6 +397,19 @@ class Loader(object):
         # an 'assert isinstance(value, basestring) and value[0:1] not in ('&', '*', '!') could probably go here.
         return value
 
+    def resolve_key(self, value):
+        """
+        resolve a "*" value for a foreign key column: the primary key of the object
+        referenced, which is not loaded for it.
+        """
+        if value[1:] in self._deferred_names:
+            self.set_deferred_references()
+        if value[1:] not in self._references:
+            raise Exception('The pointer %(val)s could not be found. Make sure that %(val)s is declared before it is used.' % { 'val': value })
+        if self._references.is_pending(value[1:]):
+            self.flush_session()
+        return self._references.key(value[1:])
+
     def has_references(self, item):
         for key, value in item.items():
             if isinstance(value, str) and value.startswith('&'):
@@ -147,7 +419,49 @@ class Loader(object):
         """
         add a reference to the internal reference dictionary
         """
+        if key[1:] in self._deferred_names:
+            # the deferred value would otherwise overwrite this one later.
+            self.set_deferred_references()
         self._references[key[1:]] = obj
+        self.stored_reference(key[1:], obj)
+
+    def references_available(self, obj, item):
+        """
+        True if every attribute the item stores a reference for already has a value,
+        for instance a preallocated primary key, so no flush is needed to read them.
+        """
+        for key, value in item.items():
+            if isinstance(value, str) and value.startswith('&') and getattr(obj, key, None) is None:
+                return False
+        return True
+
+    def defer_references(self, obj, item):
+        """
+        remember an object whose attribute references can only be read once it has
+        been flushed.  The flush waits until a "*" value needs one of them, so a block
+        of such rows costs one flush instead of one per row.
+        """
+        self._deferred.append((obj, item))
+        for value in item.values():
+            if isinstance(value, str) and value.startswith('&'):
+                self._deferred_names.add(value[1:])
+
+    def set_deferred_references(self, flush=True):
+        """
+        flush the session and store the deferred attribute references.  Pass
+        flush=False when the session has just been flushed.
+        """
+        if not self._deferred:
+            return
+        if flush:
+            self.flush_session()
+            self.reference_flushes += 1
+        self.flushes_saved += len(self._deferred) - (1 if flush else 0)
+        deferred = self._deferred
+        self._deferred = []
+        self._deferred_names = set()
+        for obj, item in deferred:
+            self.set_references(obj, item)
 
     def set_references(self, obj, item):
         """
@@ -156,36 +470,218 @@ class Loader(object):
         for key, value in item.items():
             if isinstance(value, str) and value.startswith('&'):
                 self._references[value[1:]] = getattr(obj, key)
+                self.stored_reference(value[1:], self._references[value[1:]])
             if isinstance(value, list):
                 for i in value:
                     if isinstance(value, str) and i.startswith('&'):
                         self._references[value[1:]] = getattr(obj, value[1:])
 
-    def _check_types(self, klass, obj):
+    def _find_cast(self, col_type):
+        """
+        find the cast function in default_casts for a column type.  TypeDecorators
+        are matched on themselves first, then on the type they decorate.
+        """
+        while col_type is not None:
+            self._add_dialect_casts(col_type)
+            for type_, func in self.default_casts.items():
+                if isinstance(col_type, type_):
+                    return func
+            if not isinstance(col_type, TypeDecorator):
+                break
+            col_type = col_type.impl
+        return None
+
+    def _add_dialect_casts(self, col_type):
+        module = type(col_type).__module__
+        if not module.startswith('sqlalchemy.dialects.'):
+            return
+        dialect = module.split('.')[2]
+        if dialect in self._dialects:
+            return
+        self._dialects.add(dialect)
+        for module_name, name, func in self.dialect_casts.get(dialect, ()):
+            try:
+                type_ = getattr(importlib.import_module(module_name), name)
+            except (ImportError, AttributeError):
+                log.error('%s.%s is not available in this version of SQLAlchemy' % (module_name, name))
+                continue
+            self.default_casts.setdefault(type_, func)
+
+    def cast_plan(self, klass):
+        """
+        returns the cast plan for a mapped class, building it on first use.
+
+        The plan maps a column key to a (cast function, blank none) pair.  Columns
+        which need neither a cast nor None replaced by '' are left out of the plan.
+        Plans are cached per class until the model changes, so changes to
+        default_casts after a plan is built require a call to clear_cast_plans.
+        """
+        plan = self._cast_plans.get(klass)
+        if plan is not None:
+            return plan
+        # the cast stage of a pipeline builds plans too, and _find_cast reads the
+        # default_casts that _add_dialect_casts adds to.
+        with self._cast_lock:
+            plan = self._cast_plans.get(klass)
+            if plan is not None:
+                return plan
+            plan = {}
+            mapper = class_mapper(klass)
+            for table in mapper.tables:
+                for col in table.columns:
+                    if col.key in plan or col.type is None:
+                        continue
+                    func = self._find_cast(col.type)
+                    blank_none = isinstance(col.type, (String, Unicode))
+                    if func is not None or blank_none:
+                        plan[col.key] = (func, blank_none)
+            self._cast_plans[klass] = plan
+        return plan
+
+    def prepare_cast_plans(self):
+        """
+        build the cast plans for every mapped class found in the model modules.
+        Returns the number of plans available.
+        """
+        for module in self.modules:
+            for name in dir(module):
+                klass = getattr(module, name, None)
+                if not isinstance(klass, type):
+                    continue
+                try:
+                    self.cast_plan(klass)
+                except UnmappedClassError:
+                    pass
+        return len(self._cast_plans)
+
+    def clear_cast_plans(self):
+        """
+        throw away the cached cast plans.
+        """
+        self._cast_plans = {}
+
+    @property
+    def precast_groups(self):
+        """
+        True if groups may be cast by cast_group before they are loaded.  Incremental
+        and merge loads look at the items as they are written, so they are not.
+        """
+        return bool(self.check_types) and not self.incremental and not self.merge
+
+    def cast_group(self, group):
+        """
+        cast the plain values of the top level items of a group to their column
+        types, in place, and return the group.  Values which are references, or which
+        hold nested items, are left to be cast as the items are loaded.
+        """
+        for name, items in group.items():
+            if name in self.control_keys or not isinstance(items, list):
+                continue
+            plan = self.cast_plan(self.get_klass(name))
+            if not plan:
+                continue
+            for item in items:
+                values = self._unwrap(item)[1]
+                for key, value in values.items():
+                    entry = plan.get(key)
+                    if entry is None:
+                        continue
+                    if value is None:
+                        if entry[1]:
+                            values[key] = ''
+                    elif entry[0] is not None and self._is_flat_value(value):
+                        values[key] = entry[0](value)
+        return group
+
+    def cast_groups(self, data):
+        """
+        cast_group every group of data, and return data.
+        """
+        if data:
+            for group in data:
+                self.cast_group(group)
+        return data
+
+    def _check_precast(self, plan, obj, source):
+        # the plain values were cast by cast_group; what is left are the values
+        # references and "&" names resolved to, which are cast if they are strings.
+        for key, value in obj.items():
+            entry = plan.get(key)
+            if entry is None:
+                continue
+            if value is None:
+                if entry[1]:
+                    obj[key] = ''
+            elif entry[0] is not None and isinstance(value, str) and \
+                    not (source is not None and self._is_flat_value(source.get(key))):
+                obj[key] = entry[0](value)
+        return obj
+
+    def _check_types(self, klass, obj, source=None):
+        """
+        cast the values of obj to the types of the columns of klass.  source is the
+        item obj was resolved from, if it was; a precast load uses it to leave the
+        values cast_group cast alone.
+        """
         if not self.check_types:
             return obj
-        mapper = class_mapper(klass)
-        for table in mapper.tables:
-            for key in list(obj.keys()):
-                col = table.columns.get(key, None)
-                value = obj[key]
-                if value is not None and col is not None and col.type is not None:
-                    for type_, func in self.default_casts.items():
-                        if isinstance(col.type, type_):
-                            obj[key] = func(value)
-                            break
-                if value is None and col is not None and isinstance(col.type, (String, Unicode)):
+        plan = self._cast_plans.get(klass)
+        if plan is None:
+            plan = self.cast_plan(klass)
+        if self._precast and not self._nesting:
+            return self._check_precast(plan, obj, source)
+        for key, value in obj.items():
+            entry = plan.get(key)
+            if entry is None:
+                continue
+            if value is None:
+                if entry[1]:
                     obj[key] = ''
+            elif entry[0] is not None:
+                obj[key] = entry[0](value)
         return obj
 
+    def record_failure(self, klass, item, index=None):
+        """
+        remember the innermost item whose loading failed, and the top level item it
+        is part of, for log_error.  Called as the error passes on up; index is where
+        a top level item is in its class block.
+        """
+        if self._failed is None:
+            self._failed = (klass, item)
+        if not self._nesting:
+            self._failed_row = item
+            self._failed_index = index
+
+    def position(self, items, index):
+        """
+        returns (line, column) of items[index] in the source, counted from 1, or None
+        when the parser did not keep its position.
+        """
+        marks = self._positions.get(id(items))
+        if marks is None or 2 * index + 1 >= len(marks):
+            return None
+        return marks[2 * index] + 1, marks[2 * index + 1] + 1
+
+    def keep_positions(self, items, marks):
+        """
+        keep the positions of a streamed chunk of items.  Only the positions of the
+        last kept_positions chunks are kept, the ones which can still be loading.
+        """
+        positions = self._positions
+        positions.pop(id(items), None)
+        positions[id(items)] = marks
+        while len(positions) > self.kept_positions:
+            del positions[next(iter(positions))]
+
+    def clear_positions(self):
+        """
+        forget the positions kept by the parser, once the data they are for is loaded.
+        """
+        self._positions = {}
+
     def get_klass(self, klass_name):
-        klass = None
-        for module in self.modules:
-            try:
-                klass = getattr(module, klass_name)
-                break;
-            except AttributeError:
-                pass
+        klass = self.registry.get(klass_name)
         # check that the class was found.
         if klass is None:
             raise AttributeError('Class %s from %s not found in any module' % (klass_name , self.source))
@@ -195,43 +691,373 @@ class Loader(object):
         """
         klass is a type, values is a dictionary. Returns a new object.
         """
-        ref_name = None
-        keys = list(values.keys())
-        if len(keys) == 1 and keys[0].startswith('&') and isinstance(values[keys[0]], dict):
-            ref_name = keys[0]
-            values = values[ref_name] # ie. item.values[0]
+        ref_name, values = self._unwrap(values)
 
         # Values is a dict of attributes and their values for any ObjectName.
         # Copy the given dict, iterate all key-values and process those with special directions (nested creations or links).
         resolved_values = values.copy()
+        foreign_keys = self.foreign_keys(klass) if self.compact_references else ()
         for key, value in resolved_values.items():
-            resolved_values[key] = self.resolve_value(value)
+            if key in foreign_keys and isinstance(value, str) and value.startswith('*'):
+                resolved_values[key] = self.resolve_key(value)
+            else:
+                resolved_values[key] = self.resolve_value(value)
 
         # _check_types currently does nothing (unless you call the loaded with a check_types parameter)
-        resolved_values = self._check_types(klass, resolved_values)
-
+        times = self.stats.times
+        start = perf_counter()
+        resolved_values = self._check_types(klass, resolved_values, values)
+        middle = perf_counter()
         obj = self.create_obj(klass, resolved_values)
+        times['create_obj'] += perf_counter() - middle
+        times['check_types'] += middle - start
+        self.stats.add_rows(klass)
+        if self._key_allocator is not None:
+            self._key_allocator.allocate(klass, obj)
         self.session.add(obj)
 
         if ref_name:
             self.add_reference(ref_name, obj)
         if self.has_references(values):
-            self.session.flush()
+            self.store_references(obj, values)
+
+        return obj
+
+    def store_references(self, obj, values):
+        """
+        store the attribute references values defines for obj, now if they are
+        available and otherwise once the session is next flushed.
+        """
+        if not self._nesting and self.references_available(obj, values):
             self.set_references(obj, values)
+            self.flushes_saved += 1
+            return
+        self.defer_references(obj, values)
+        if self._nesting:
+            # nested objects are attached to their parent as soon as they are
+            # returned, so they are flushed first, as before.
+            self.set_deferred_references()
+
+    def _unwrap(self, values):
+        """
+        returns (reference name or None, attribute values) for an item.
+        """
+        keys = list(values.keys())
+        if len(keys) == 1 and keys[0].startswith('&') and isinstance(values[keys[0]], dict):
+            return keys[0], values[keys[0]] # ie. item.values[0]
+        return None, values
+
+    def natural_key(self, klass):
+        """
+        returns the attribute names which identify rows of klass in merge mode.
+        """
+        key = self.natural_keys.get(klass, self.natural_keys.get(klass.__name__))
+        if key is None:
+            key = getattr(klass, '__natural_key__', None)
+        if key is None:
+            mapper = class_mapper(klass)
+            key = [mapper.get_property_by_column(col).key for col in mapper.primary_key]
+        if isinstance(key, str):
+            key = (key,)
+        return tuple(key)
+
+    def _key_value(self, klass, key, values):
+        """
+        returns the natural key of an item as stored in the database, or None if the
+        item does not give all of it.  An attribute which stores a "&" reference has
+        the value the reference already holds, if it does, as when the references of
+        an earlier load are passed in.
+        """
+        ref_name, values = self._unwrap(values)
+        plan = self.cast_plan(klass) if self.check_types else {}
+        result = []
+        for attr in key:
+            value = values.get(attr)
+            if isinstance(value, str) and value.startswith('&'):
+                if value[1:] in self._deferred_names:
+                    self.set_deferred_references()
+                if value[1:] not in self._references:
+                    return None
+                value = self._references[value[1:]]
+            if value is None or isinstance(value, (dict, list)) or \
+                    (isinstance(value, str) and value.startswith('!')):
+                return None
+            if isinstance(value, str) and value.startswith('*'):
+                value = self.resolve_value(value)
+            entry = plan.get(attr)
+            if entry is not None and entry[0] is not None:
+                value = entry[0](value)
+            result.append(value)
+        return tuple(result)
+
+    def find_existing(self, klass, key, key_values):
+        """
+        returns {natural key: object} for the rows of klass whose natural key is in
+        key_values, fetched with one query.
+        """
+        if not key_values:
+            return {}
+        if len(key) == 1:
+            criterion = getattr(klass, key[0]).in_([value[0] for value in key_values])
+        else:
+            criterion = tuple_(*[getattr(klass, attr) for attr in key]).in_(list(key_values))
+        existing = {}
+        for obj in self.session.query(klass).filter(criterion):
+            existing[tuple(getattr(obj, attr) for attr in key)] = obj
+        return existing
 
+    def merge_klasses(self, klass, items):
+        """
+        Like add_klasses, but items which match a row already in the database update
+        that row.  Returns the objects, new or existing.
+        """
+        key = self.natural_key(klass)
+        objects = []
+        for start in range(0, len(items), self.batch_size):
+            chunk = items[start:start + self.batch_size]
+            key_values = [self._key_value(klass, key, item) for item in chunk]
+            existing = self.find_existing(klass, key, set(value for value in key_values if value is not None))
+            for index, (item, key_value) in enumerate(zip(chunk, key_values), start):
+                obj = existing.get(key_value) if key_value is not None else None
+                try:
+                    if obj is None:
+                        obj = self.add_klass_with_values(klass, item)
+                        if key_value is not None:
+                            existing[key_value] = obj
+                    else:
+                        self.update_klass_with_values(klass, obj, item)
+                except Exception:
+                    self.record_failure(klass, item, index)
+                    raise
+                if not self.expunge:
+                    objects.append(obj)
+            # the objects of a batch are only left once all of them are updated.
+            self.end_rows(len(chunk))
+        return objects
+
+    def update_klass_with_values(self, klass, obj, values):
+        """
+        set the attributes of an existing object which differ from values.
+        """
+        ref_name, values = self._unwrap(values)
+        resolved_values = {}
+        for key, value in values.items():
+            if isinstance(value, str) and value.startswith('&'):
+                continue
+            resolved_values[key] = self.resolve_value(value)
+        start = perf_counter()
+        resolved_values = self._check_types(klass, resolved_values)
+        self.stats.times['check_types'] += perf_counter() - start
+
+        changed = False
+        for key, value in resolved_values.items():
+            if getattr(obj, key) != value:
+                setattr(obj, key, value)
+                changed = True
+        if changed:
+            self.stats.updated += 1
+        else:
+            self.stats.unchanged += 1
+        self.stats.add_rows(klass)
+
+        if ref_name:
+            self.add_reference(ref_name, obj)
+        if self.has_references(values):
+            self.store_references(obj, values)
         return obj
 
+    def bulk_plan(self, klass):
+        """
+        returns (table, {attribute key: column key}) for a class whose rows can be
+        written with a Core insert, or None when the class needs the ORM
+        (inheritance across tables or polymorphic loading).
+        """
+        if klass in self._bulk_plans:
+            return self._bulk_plans[klass]
+        plan = None
+        mapper = class_mapper(klass)
+        if len(mapper.tables) == 1 and mapper.polymorphic_on is None:
+            columns = {}
+            for prop in mapper.column_attrs:
+                if len(prop.columns) == 1:
+                    columns[prop.key] = prop.columns[0].key
+            plan = (mapper.tables[0], columns)
+        self._bulk_plans[klass] = plan
+        return plan
+
+    def _is_flat_value(self, value):
+        if isinstance(value, str):
+            return value[:1] not in ('&', '*', '!')
+        if isinstance(value, dict):
+            return False
+        if isinstance(value, list):
+            for list_item in value:
+                if not self._is_flat_value(list_item):
+                    return False
+        return True
+
+    def _is_flat_row(self, columns, item):
+        """
+        True if every key of the item is a column attribute holding a plain value.
+        """
+        if not isinstance(item, dict):
+            return False
+        for key, value in item.items():
+            if key not in columns or not self._is_flat_value(value):
+                return False
+        return True
+
+    def cast_rows(self, klass, rows, items):
+        """
+        cast the values of bulk mode rows, which all have the same keys, a column at
+        a time with convert_column, as _check_types would cast them row by row.
+        items are (index, row as given) pairs, to record the one that fails.
+        """
+        if not self.check_types or self._precast:
+            # the cast stage of a pipeline has cast them already.
+            return
+        plan = self.cast_plan(klass)
+        try:
+            for key in rows[0]:
+                entry = plan.get(key)
+                if entry is None:
+                    continue
+                cast, blank_none = entry
+                values = [row[key] for row in rows]
+                if cast is not None:
+                    values = convert_column(cast, values)
+                for row, value in zip(rows, values):
+                    row[key] = '' if value is None and blank_none else value
+        except Exception:
+            for index, item in items:
+                try:
+                    self._check_types(klass, dict(item))
+                except Exception:
+                    self.record_failure(klass, item, index)
+                    break
+            raise
+
+    def write_pending(self):
+        """
+        cast and insert the rows collected in bulk mode.  The session is flushed first
+        so that the rows land after any ORM objects that came before them.
+        """
+        if not self._pending:
+            return
+        klass, table, rows, items = self._pending
+        self._pending = None
+        self._pending_keys = None
+        start = perf_counter()
+        self.cast_rows(klass, rows, items)
+        self.stats.times['check_types'] += perf_counter() - start
+        columns = self.bulk_plan(klass)[1]
+        rows = [dict((columns[key], value) for key, value in row.items()) for row in rows]
+        if self._key_allocator is not None:
+            # the rows are inserted with their keys, so later keys skip past them.
+            for row in rows:
+                self._key_allocator.allocate_row(klass, row)
+        self.flush_session()
+        writer = self.get_writer(klass)
+        start = perf_counter()
+        for index in range(0, len(rows), self.batch_size):
+            writer.write(self.session, table, rows[index:index + self.batch_size])
+        self.stats.times['write'] += perf_counter() - start
+        self.stats.add_rows(klass, len(rows))
+
+    def get_writer(self, klass):
+        """
+        returns the writer for the bulk rows of klass.
+        """
+        writer = self.class_writers.get(klass, self.class_writers.get(klass.__name__))
+        if writer is not None:
+            return writer
+        dialect = self.session.get_bind(class_mapper(klass)).dialect
+        return get_writer(self.writer, dialect.name)
+
+    def bulk_add_klasses(self, klass, items):
+        """
+        Like add_klasses, but flat rows are collected and inserted in batches.
+        Rows that need ORM semantics go through add_klass_with_values in order.
+        """
+        plan = self.bulk_plan(klass)
+        if plan is None:
+            return self.add_klasses(klass, items)
+        table, columns = plan
+        for index, item in enumerate(items):
+            if not self._is_flat_row(columns, item):
+                self.write_pending()
+                try:
+                    self.add_klass_with_values(klass, item)
+                except Exception:
+                    self.record_failure(klass, item, index)
+                    raise
+                self.end_rows()
+                continue
+            # the values are cast a column at a time when the batch is written.
+            keys = tuple(item)
+            if self._pending is None or self._pending_keys != keys or self._pending[0] is not klass:
+                self.write_pending()
+                self._pending = (klass, table, [], [])
+                self._pending_keys = keys
+            self._pending[2].append(dict(item))
+            self._pending[3].append((index, item))
+            if len(self._pending[2]) >= self.batch_size:
+                self.write_pending()
+            self.end_rows()
+        self.write_pending()
+
     def add_klasses(self, klass, items):
         """
         Returns a list of the new objects. These objects are already in session, so you don't *need* to do anything with them.
         """
         objects = []
-        for item in items:
-            obj = self.add_klass_with_values(klass, item)
-            objects.append(obj)
+        keep = self._nesting or not self.expunge
+        for index, item in enumerate(items):
+            try:
+                obj = self.add_klass_with_values(klass, item)
+            except Exception:
+                self.record_failure(klass, item, index)
+                raise
+            if keep:
+                objects.append(obj)
+            if not self._nesting:
+                self.end_rows()
         return objects
 
+    def end_rows(self, count=1):
+        """
+        called after top level rows, to flush or commit every flush_every or
+        commit_every rows.
+        """
+        if not (self.flush_every or self.commit_every):
+            return
+        self._unflushed += count
+        self._uncommitted += count
+        if self.commit_every and self._uncommitted >= self.commit_every:
+            self.set_deferred_references()
+            self.commit_session()
+        elif self.flush_every and self._unflushed >= self.flush_every:
+            self.flush_session()
+            self.set_deferred_references(flush=False)
+        else:
+            return
+        if self.expunge:
+            self.session.expunge_all()
+
+
 
+    def end_group(self, group):
+        """
+        carry out the flush, commit and clear keys of a group.
+        """
+        if 'flush' in group:
+            self.flush_session()
+            self.set_deferred_references(flush=False)
+        if 'commit' in group:
+            self.set_deferred_references()
+            self.commit_session()
+        if 'clear' in group:
+            self.clear()
 
     def from_list(self, session, data):
         """
@@ -300,64 +1126,571 @@ class Loader(object):
         Also, literal tags, like !Climate (without quotes), do not work, and will generally break.
         """
         self.session = session
+        if self.compact_references:
+            self._references.session = session
+        if self.preallocate_keys:
+            self._key_allocator = KeyAllocator(session, self.preallocate_keys)
+        stats = self.stats = LoadStats()
+        flushes_saved = self.flushes_saved
         klass = None
         item = None
+        items = None
         group = None
-        skip_keys = ['flush', 'commit', 'clear']
+        skip_keys = self.control_keys
+        self._failed = self._failed_row = self._failed_index = None
+        tracker = None
+        pipeline = None
+        precast = self._precast
+        phase = 'parse'
+        if self.pipeline and not isinstance(data, (list, tuple)):
+            # the stages pass (group, positions) pairs, whose positions are kept here,
+            # on the loading thread.
+            if not self._positioned:
+                data = ((group, None) for group in data)
+            cast = self._cast_positioned if self.precast_groups else None
+            pipeline = Pipeline(data, cast, self.pipeline)
+            data = self._received(pipeline)
+            self._precast = cast is not None
+            phase = 'wait'
         try:
-            for group in data:
+            if self.incremental:
+                tracker = GroupTracker(self, session, self.source)
+            for index, group in enumerate(self._timed_groups(data, phase)):
+                if tracker is not None:
+                    state = tracker.check(group)
+                    if state.skip:
+                        tracker.restore(state)
+                        self.end_group(group)
+                        stats.skipped_groups += 1
+                        continue
+                self.fire('group_start', index, group)
                 for name, items in group.items():
                     if name not in skip_keys:
                         klass = self.get_klass(name)
-                        self.add_klasses(klass, items)
-                
-                if 'flush' in group:
-                    session.flush()
-                if 'commit' in group:
-                    session.commit()
-                if 'clear' in group:
-                    self.clear()
+                        self.fire('class_start', klass, items)
+                        if self.merge:
+                            self.merge_klasses(klass, items)
+                        elif self.bulk:
+                            self.bulk_add_klasses(klass, items)
+                        else:
+                            self.add_klasses(klass, items)
+                        self.fire('class_end', klass, items)
+                if tracker is not None:
+                    tracker.record(state)
+                self.end_group(group)
+                stats.groups += 1
+                self.fire('group_end', index, group)
+
+            self.set_deferred_references()
 
         except AttributeError as e:
-            if hasattr(item, 'iteritems'):
-                missing_refs = [(key, value) for key, value in item.items() if isinstance(value,str) and value.startswith('*')]
-                self.log_error(e, data, klass, item)
-                if missing_refs:
-                    log.error('*'*80)
-                    log.error('It is very possible you are missing a reference, or require a "flush:" between blocks to store the references')
-                    log.error('here is a list of references that were not accessible (key, value): %s'%missing_refs)
-                    log.error('*'*80)
-            else:
-                self.log_error(e, data, klass, item)
-        ## except IntegrityError, e:
-        ##     raise IntegrityError("Error while inserting %s. Original Error: %s" % 
-        ##         (klass.__name__, str(item), str(e)))
-        #except Exception, e:
-        #    self.log_error(sys.exc_info()[2], data, klass, item)
-        #    raise
+            self.log_error(e, data, klass, item, items)
+        except Exception as e:
+            self.log_error(e, data, klass, item, items)
+            raise
+        finally:
+            if pipeline is not None:
+                pipeline.close()
+                self._precast = precast
+                stats.times['parse'] += pipeline.parse_seconds
+                stats.times['check_types'] += pipeline.cast_seconds
 
         self.session = None
+        self._key_allocator = None
+        stats.flushes_saved = self.flushes_saved - flushes_saved
+        return stats
+
+    def from_parsed(self, session, data, parse_time):
+        """
+        from_list for data that took parse_time seconds to parse.  Returns the stats.
+        """
+        try:
+            if data:
+                stats = self.from_list(session, data)
+            else:
+                stats = self.stats = LoadStats()
+        finally:
+            self.clear_positions()
+        stats.times['parse'] += parse_time
+        return stats
+
+    def _cast_positioned(self, item):
+        group, positions = item
+        return self.cast_group(group), positions
+
+    def _received(self, pipeline):
+        """
+        yield the groups of the (group, positions) pairs of a pipeline, keeping their
+        positions.
+        """
+        for group, positions in pipeline:
+            if positions:
+                for name, marks in positions.items():
+                    self.keep_positions(group[name], marks)
+            yield group
 
-    def log_error(self, e, data, klass, item):
-            log.error('error occured while loading yaml data with output:\n%s'%pformat(data))
-            log.error('references:\n%s'%pformat(self._references))
-            log.error('class: %s'%klass)
-            log.error('item: %s'%item)
+    def _timed_groups(self, data, phase='parse'):
+        """
+        iterate the groups of data, counting the time it takes to produce them as parse
+        time, which is where streamed documents are parsed, or as wait time for a
+        pipeline, which parses on threads of its own.
+        """
+        groups = iter(data)
+        times = self.stats.times
+        times.setdefault(phase, 0.0)
+        while True:
+            start = perf_counter()
+            try:
+                group = next(groups)
+            except StopIteration:
+                return
+            finally:
+                times[phase] += perf_counter() - start
+            yield group
+
+    def log_error(self, e, data, klass, item, items=None):
+        """
+        log the error, the item which failed and its class, where the item is in the
+        source and the references it uses.  The item that failed, as recorded by
+        record_failure, is logged rather than klass and item when there is one, and
+        items is the class block it came from.  data is not logged: everything is
+        shortened, so that this costs about as much as the failing row whatever the
+        size of the load.
+        """
+        if self._failed is not None:
+            klass, item = self._failed
+        row = self._failed_row if self._failed_row is not None else item
+        message = str(e)
+        if len(message) > max_logged_message:
+            message = message[:max_logged_message] + '...'
+        log.error('error occured while loading %s: %s: %s' % (self.source, e.__class__.__name__, message))
+        log.error('class: %s' % getattr(klass, '__name__', klass))
+        log.error('item: %s' % _short.repr(item))
+        index = self._failed_index if self._failed_row is not None else None
+        position = self.position(items, index) if items is not None and index is not None else None
+        if position is not None:
+            log.error('at: %s, line %d, column %d' % ((self.source,) + position))
+
+        used = set()
+        scan_references(row, set(), used)
+        references = self._references
+        missing = []
+        log.error('references: %d defined, %d used by the item' % (len(references), len(used)))
+        for name in sorted(used)[:max_logged_references]:
+            if name not in references:
+                missing.append(name)
+                log.error('  *%s: not defined' % name)
+            elif isinstance(references, ReferenceStore):
+                log.error('  *%s: %s' % (name, _short.repr(references.peek(name))))
+            else:
+                log.error('  *%s: %s' % (name, _short.repr(references[name])))
+        if missing:
+            log.error('It is very possible you are missing a reference, or require a "flush:" between blocks to store the references')
 
 class YamlLoader(Loader):
+    """
+       Yaml Loader
 
-    def loadf(self, session, filename):
+       *Arguments*
+          chunk_size
+            largest number of items of one class handed to from_list at a time when streaming.
+          yaml_loader
+            the yaml loader class used for parsing.  Defaults to CSafeFixtureLoader when
+            PyYaml has libyaml support, and SafeFixtureLoader otherwise.
+          cache
+            a :class:`bootalchemy.cache.FixtureCache`, or a directory for one, which keeps
+            the parsed data of files read with loadf so that unchanged files are not
+            parsed again.
+
+       See :class:`Loader` for the other arguments.
+    """
+
+    def __init__(self, model, references=None, check_types=True, chunk_size=1000, yaml_loader=None,
+                 cache=None, **kw):
+        Loader.__init__(self, model, references=references, check_types=check_types, **kw)
+        self.chunk_size = chunk_size
+        self._yaml_loader_class = yaml_loader
+        if isinstance(cache, str):
+            cache = FixtureCache(cache)
+        self.cache = cache
+
+    def _get_yaml_loader_class(self):
+        if self._yaml_loader_class is None:
+            return parsers().DefaultYamlLoader
+        return self._yaml_loader_class
+
+    def _set_yaml_loader_class(self, yaml_loader):
+        self._yaml_loader_class = yaml_loader
+
+    yaml_loader_class = property(_get_yaml_loader_class, _set_yaml_loader_class)
+
+    @property
+    def yaml_backend(self):
         """
-        Load a yaml file by filename.
+        'libyaml' if the yaml loader parses with the C extension, 'python' otherwise.
+        """
+        CParser = parsers().CParser
+        if CParser is not None and issubclass(self.yaml_loader_class, CParser):
+            return 'libyaml'
+        return 'python'
+
+    def loadf(self, session, filename, stream=False):
+        """
+        Load a yaml file by filename.  With stream=True the file is parsed and inserted
+        a chunk at a time rather than read and parsed up front; streamed files do not
+        go through the cache.  With a pipeline, files are always streamed, and parsed
+        in a process of their own.
         """
         self.source = filename
-        s = open(filename).read()
-        return self.loads(session, s)
+        if self.pipeline:
+            groups = ProcessGroups(stream_yaml_file, (filename, self.yaml_loader_class, self.chunk_size),
+                                   self.pipeline)
+            return self._load_positioned(session, groups)
+        if stream:
+            with open(filename) as f:
+                return self.load_stream(session, f)
+        start = perf_counter()
+        data = self.read(filename)
+        return self.from_parsed(session, data, perf_counter() - start)
+
+    def read(self, filename):
+        """
+        returns the parsed contents of a yaml file, through the cache if there is one.
+        """
+        if self.cache is None:
+            with open(filename) as f:
+                return self.parse(f.read())
+        with open(filename, 'rb') as f:
+            content = f.read()
+        key = self.cache.key(content, self.yaml_loader_class)
+        data = self.cache.get(key)
+        if data is None:
+            data = self.parse(content)
+            self.cache.put(key, data)
+        return data
+
+    def load_stream(self, session, stream):
+        """
+        Load a yaml string or file object into the database, handing each group to
+        from_list as soon as it is parsed.  See iter_groups.
+        """
+        if self.pipeline:
+            groups = positioned_groups(stream, self.yaml_loader_class, self.chunk_size)
+            return self._load_positioned(session, groups)
+        try:
+            return self.from_list(session, self.iter_groups(stream))
+        finally:
+            self.clear_positions()
+
+    def _load_positioned(self, session, groups):
+        # groups yields (group, positions) pairs, parsed by a loader of their own, so
+        # that the parsing thread or process never touches the positions of this one.
+        self._positioned = True
+        try:
+            return self.from_list(session, groups)
+        finally:
+            self._positioned = False
+            self.clear_positions()
+
+    def iter_groups(self, stream):
+        """
+        Parse the first document of a yaml stream lazily, yielding groups in the
+        from_list format.  Class blocks are split into groups of at most chunk_size
+        items, and the flush/commit/clear keys of a group are yielded as a group of
+        their own once the class blocks before them are done, so from_list does the
+        same work in the same order as with the fully parsed document.
+
+        Items are constructed one at a time, so yaml aliases may only refer to
+        anchors within the same item.
+        """
+        yaml = parsers()
+        parser = self.yaml_loader_class(stream)
+        try:
+            parser.get_event()
+            if parser.check_event(yaml.StreamEndEvent):
+                return
+            parser.get_event()
+            if not parser.check_event(yaml.SequenceStartEvent):
+                data = self._construct_next(parser)
+                if data:
+                    for group in data:
+                        yield group
+                return
+            parser.get_event()
+            while not parser.check_event(yaml.SequenceEndEvent):
+                if parser.check_event(yaml.MappingStartEvent):
+                    for group in self._iter_group(parser):
+                        yield group
+                else:
+                    yield self._construct_next(parser)
+        finally:
+            parser.dispose()
+
+    def _iter_group(self, parser):
+        yaml = parsers()
+        parser.get_event()
+        controls = {}
+        while not parser.check_event(yaml.MappingEndEvent):
+            name = self._construct_next(parser)
+            if name in self.control_keys or not parser.check_event(yaml.SequenceStartEvent):
+                value = self._construct_next(parser)
+                if name in self.control_keys:
+                    controls[name] = value
+                else:
+                    yield {name: value}
+                continue
+            parser.get_event()
+            chunk = []
+            marks = array('l')
+            while not parser.check_event(yaml.SequenceEndEvent):
+                node = self._compose_node(parser, {})
+                marks.append(node.start_mark.line)
+                marks.append(node.start_mark.column)
+                chunk.append(parser.construct_document(node))
+                if len(chunk) >= self.chunk_size:
+                    self.keep_positions(chunk, marks)
+                    yield {name: chunk}
+                    chunk = []
+                    marks = array('l')
+            parser.get_event()
+            if chunk:
+                self.keep_positions(chunk, marks)
+                yield {name: chunk}
+        parser.get_event()
+        if controls:
+            yield controls
+
+    def _construct_next(self, parser):
+        return parser.construct_document(self._compose_node(parser, {}))
+
+    def _compose_node(self, parser, anchors):
+        """
+        Build the next node from the event stream.  This is what yaml's Composer does,
+        but it only needs get_event/check_event so it works with the libyaml parser too.
+        """
+        yaml = parsers()
+        event = parser.get_event()
+        if isinstance(event, yaml.AliasEvent):
+            if event.anchor not in anchors:
+                raise yaml.ComposerError(None, None, "found undefined alias %r" % event.anchor,
+                                         event.start_mark)
+            return anchors[event.anchor]
+        if isinstance(event, yaml.ScalarEvent):
+            tag = event.tag
+            if tag is None or tag == '!':
+                tag = parser.resolve(yaml.ScalarNode, event.value, event.implicit)
+            node = yaml.ScalarNode(tag, event.value, event.start_mark, event.end_mark,
+                              style=event.style)
+        elif isinstance(event, yaml.SequenceStartEvent):
+            tag = event.tag
+            if tag is None or tag == '!':
+                tag = parser.resolve(yaml.SequenceNode, None, event.implicit)
+            node = yaml.SequenceNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+            if event.anchor is not None:
+                anchors[event.anchor] = node
+            while not parser.check_event(yaml.SequenceEndEvent):
+                node.value.append(self._compose_node(parser, anchors))
+            node.end_mark = parser.get_event().end_mark
+            return node
+        else:
+            tag = event.tag
+            if tag is None or tag == '!':
+                tag = parser.resolve(yaml.MappingNode, None, event.implicit)
+            node = yaml.MappingNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+            if event.anchor is not None:
+                anchors[event.anchor] = node
+            while not parser.check_event(yaml.MappingEndEvent):
+                key = self._compose_node(parser, anchors)
+                value = self._compose_node(parser, anchors)
+                node.value.append((key, value))
+            node.end_mark = parser.get_event().end_mark
+            return node
+        if event.anchor is not None:
+            anchors[event.anchor] = node
+        return node
+
+    def parse(self, s):
+        """
+        Parse a yaml string or file, keeping the positions of its items for log_error
+        when the yaml loader class can.
+        """
+        parser = self.yaml_loader_class(s)
+        try:
+            if hasattr(parser, 'positions'):
+                parser.positions = {}
+            data = parser.get_single_data()
+            self._positions = getattr(parser, 'positions', None) or {}
+        finally:
+            parser.dispose()
+        return data
 
     def loads(self, session, s):
         """
         Load a yaml string into the database.
         """
-        data = load(s)
-        if data:
-            return self.from_list(session, data)
+        start = perf_counter()
+        data = self.parse(s)
+        return self.from_parsed(session, data, perf_counter() - start)
+
+
+def positioned_groups(stream, yaml_loader, chunk_size):
+    """
+    yield (group, {class name: positions}) for the groups of a yaml stream, as
+    YamlLoader.iter_groups makes them.  Runs in the parsing stage of a pipelined load.
+    """
+    loader = YamlLoader([], chunk_size=chunk_size, yaml_loader=yaml_loader)
+    for group in loader.iter_groups(stream):
+        positions = {}
+        for name, items in group.items():
+            marks = loader._positions.get(id(items))
+            if marks is not None:
+                positions[name] = marks
+        yield group, positions
+
+def stream_yaml_file(filename, yaml_loader, chunk_size):
+    """
+    positioned_groups for a yaml file.  Runs in the parser process of a pipelined load.
+    """
+    with open(filename) as f:
+        for item in positioned_groups(f, yaml_loader, chunk_size):
+            yield item
+
+class JsonLoader(Loader):
+    """
+       Json Loader, for documents with the same structure as :meth:`Loader.from_list` takes.
+    """
+
+    def loadf(self, session, filename):
+        """
+        Load a json file by filename.
+        """
+        self.source = filename
+        start = perf_counter()
+        with open(filename) as f:
+            data = json.load(f)
+        return self.from_parsed(session, data, perf_counter() - start)
+
+    def loads(self, session, s):
+        """
+        Load a json string into the database.
+        """
+        start = perf_counter()
+        data = json.loads(s)
+        return self.from_parsed(session, data, perf_counter() - start)
+
+class NdjsonLoader(Loader):
+    """
+       Newline delimited Json Loader
+
+       Each line holds one object.  A line with a single class name mapped to an object
+       is one row of that class, such as {"User": {"user_name": "sue"}}; consecutive rows
+       of the same class are handed to from_list together, chunk_size at a time.  Any
+       other line is a group of its own, such as {"flush": null, "commit": null}.
+       Blank lines are skipped.
+
+       *Arguments*
+          chunk_size
+            largest number of rows of one class handed to from_list at a time.
+
+       See :class:`Loader` for the other arguments.
+    """
+
+    def __init__(self, model, references=None, check_types=True, chunk_size=1000, **kw):
+        Loader.__init__(self, model, references=references, check_types=check_types, **kw)
+        self.chunk_size = chunk_size
+
+    def loadf(self, session, filename):
+        """
+        Load a newline delimited json file by filename, a chunk at a time.
+        """
+        self.source = filename
+        with open(filename) as f:
+            return self.from_list(session, self.iter_groups(f))
+
+    def loads(self, session, s):
+        """
+        Load a newline delimited json string into the database.
+        """
+        return self.from_list(session, self.iter_groups(s.splitlines()))
+
+    def iter_groups(self, lines):
+        """
+        yield the from_list groups for an iterable of lines.
+        """
+        name = None
+        chunk = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            obj = json.loads(line)
+            row_name = None
+            if isinstance(obj, dict) and len(obj) == 1:
+                key, value = next(iter(obj.items()))
+                if key not in self.control_keys and isinstance(value, dict):
+                    row_name = key
+            if chunk and (row_name != name or len(chunk) >= self.chunk_size):
+                yield {name: chunk}
+                chunk = []
+            if row_name is None:
+                yield obj
+                continue
+            name = row_name
+            chunk.append(obj[row_name])
+        if chunk:
+            yield {name: chunk}
+
+class CsvLoader(Loader):
+    """
+       Csv Loader
+
+       A csv file holds the rows of one class.  Its header row names the attributes,
+       empty cells are None, and cells may hold "&" and "*" references.  Files are read
+       a chunk at a time with the csv module.
+
+       *Arguments*
+          chunk_size
+            largest number of rows handed to from_list at a time.
+          csv_options
+            keyword arguments for csv.DictReader, such as delimiter.
+
+       See :class:`Loader` for the other arguments.
+    """
+
+    def __init__(self, model, references=None, check_types=True, chunk_size=1000, csv_options=None, **kw):
+        Loader.__init__(self, model, references=references, check_types=check_types, **kw)
+        self.chunk_size = chunk_size
+        self.csv_options = csv_options or {}
+
+    def loadf(self, session, filename, klass_name=None):
+        """
+        Load a csv file by filename.  The class defaults to the file's name without
+        its extension, so User.csv holds Users.
+        """
+        self.source = filename
+        if klass_name is None:
+            klass_name = os.path.splitext(os.path.basename(filename))[0]
+        with open(filename, newline='') as f:
+            return self.from_list(session, self.iter_groups(f, klass_name))
+
+    def loads(self, session, s, klass_name):
+        """
+        Load a csv string holding klass_name rows into the database.
+        """
+        return self.from_list(session, self.iter_groups(s.splitlines(), klass_name))
+
+    def iter_groups(self, lines, klass_name):
+        """
+        yield the from_list groups for an iterable of csv lines.
+        """
+        chunk = []
+        for row in csv.DictReader(lines, **self.csv_options):
+            for key, value in row.items():
+                if value == '':
+                    row[key] = None
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                yield {klass_name: chunk}
+                chunk = []
+        if chunk:
+            yield {klass_name: chunk}
@@ -0,0 +1,221 @@
+"""
+Loading independent fixture groups in parallel worker processes.
+
+The groups of a document are levelled by their references: a group which uses a
+"*" reference runs after the group that defines it, groups on the same level do
+not depend on each other and are spread over the worker processes.  Each worker
+loads its groups through its own engine and commits them, then hands the
+references it defined back as plain values, with objects replaced by their class
+and primary key, so the next level can look up the ones it uses again in its own
+session.
+
+SQLite databases take one writer at a time, so for them the partitions of a level
+are loaded one after the other rather than at once.
+"""
+import multiprocessing
+from importlib import import_module
+
+from sqlalchemy import create_engine, tuple_
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.orm import sessionmaker, object_mapper, class_mapper
+from sqlalchemy.orm.exc import UnmappedInstanceError
+
+from .loader import Loader, parsers, scan_references
+from .stats import LoadStats
+
+class ObjectReference(tuple):
+    """
+    a reference to a mapped object that can cross a process boundary:
+    (module name, class name, primary key tuple).
+    """
+
+def export_references(references):
+    """
+    returns references with mapped objects replaced by ObjectReferences.
+    """
+    exported = {}
+    for name, value in references.items():
+        try:
+            mapper = object_mapper(value)
+        except UnmappedInstanceError:
+            exported[name] = value
+            continue
+        klass = mapper.class_
+        exported[name] = ObjectReference((klass.__module__, klass.__name__,
+                                          tuple(mapper.primary_key_from_instance(value))))
+    return exported
+
+def import_references(session, references, batch_size=1000):
+    """
+    returns references with ObjectReferences loaded from the session, with one query
+    per class for every batch_size of them.
+    """
+    imported = {}
+    wanted = {}
+    for name, value in references.items():
+        if isinstance(value, ObjectReference):
+            wanted.setdefault(tuple(value[:2]), []).append((name, value[2]))
+        else:
+            imported[name] = value
+    for (module, klass_name), names in wanted.items():
+        klass = getattr(import_module(module), klass_name)
+        mapper = class_mapper(klass)
+        keys = list(set(key for name, key in names))
+        objects = {}
+        for start in range(0, len(keys), batch_size):
+            chunk = keys[start:start + batch_size]
+            if len(mapper.primary_key) == 1:
+                criterion = mapper.primary_key[0].in_([key[0] for key in chunk])
+            else:
+                criterion = tuple_(*mapper.primary_key).in_(chunk)
+            for obj in session.query(klass).filter(criterion):
+                objects[tuple(mapper.primary_key_from_instance(obj))] = obj
+        for name, key in names:
+            imported[name] = objects.get(key)
+    return imported
+
+def _count_rows(group):
+    return sum(len(items) for name, items in group.items()
+               if name not in Loader.control_keys and isinstance(items, list))
+
+def _load_partition(url, model, loader_class, options, references, groups, defined):
+    engine = create_engine(url)
+    session = sessionmaker(bind=engine)()
+    try:
+        loader = loader_class(model, references=import_references(session, references, options.get('batch_size', 1000)),
+                              **options)
+        stats = loader.from_list(session, groups)
+        session.commit()
+        stats.commits += 1
+        return export_references(dict((name, value) for name, value in loader._references.items()
+                                      if name in defined)), stats
+    finally:
+        session.close()
+        engine.dispose()
+
+class ParallelLoader(object):
+    """
+       Parallel Loader
+
+       *Arguments*
+          model
+            the model modules, given by name (or as modules) so the workers can import them.
+          processes
+            number of worker processes, defaults to the number of cpus.
+          references
+            references to initialize with, plain values or mapped objects.
+          loader_class
+            the loader used in the workers.
+          yaml_loader
+            the yaml loader class used by loads and loadf.
+
+       Any other keyword arguments are passed on to the loader in each worker.
+
+       Every partition is committed on its own, so a failure part way through leaves
+       the partitions before it in the database.  Documents which use "clear:" are
+       loaded by a single worker, in order.  The partitions of a SQLite database are
+       loaded one at a time.
+
+       *Attributes*
+          references
+            the references defined so far, with objects as ObjectReferences.
+    """
+
+    def __init__(self, model, processes=None, references=None, loader_class=Loader,
+                 yaml_loader=None, **options):
+        if not isinstance(model, list):
+            model = [model]
+        self.model = [getattr(item, '__name__', item) for item in model]
+        self.processes = processes or multiprocessing.cpu_count()
+        self.loader_class = loader_class
+        self.yaml_loader_class = yaml_loader
+        self.options = options
+        self.references = export_references(references or {})
+
+    def levels(self, data):
+        """
+        returns the groups of data as a list of levels, each a list of partitions, each
+        a list of (index, group).  A level only uses references defined on earlier levels.
+        """
+        data = list(data)
+        if any('clear' in group for group in data):
+            return [[list(enumerate(data))]]
+        definers = {}
+        group_levels = []
+        for index, group in enumerate(data):
+            defined, used = set(), set()
+            scan_references(group, defined, used)
+            level = 0
+            for name in used - defined:
+                if name in definers:
+                    level = max(level, group_levels[definers[name]] + 1)
+            group_levels.append(level)
+            for name in defined:
+                definers[name] = index
+
+        levels = []
+        for level in range(max(group_levels) + 1 if group_levels else 0):
+            partitions = [[] for i in range(self.processes)]
+            sizes = [0] * self.processes
+            for index, group in enumerate(data):
+                if group_levels[index] != level:
+                    continue
+                smallest = sizes.index(min(sizes))
+                partitions[smallest].append((index, group))
+                sizes[smallest] += _count_rows(group) or 1
+            levels.append([partition for partition in partitions if partition])
+        return levels
+
+    def from_list(self, url, data):
+        """
+        Load data (see :meth:`bootalchemy.loader.Loader.from_list`) into the database at
+        url.  Returns the stats of all the workers together; the references defined are
+        added to references.
+        """
+        levels = self.levels(data)
+        # SQLite locks the whole database for a write, so its partitions would only
+        # wait for each other, or fail once the lock times out.
+        serial = make_url(url).get_backend_name() == 'sqlite'
+        stats = LoadStats()
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            for level in levels:
+                results = []
+                for partition in level:
+                    groups = [group for index, group in partition]
+                    defined, used = set(), set()
+                    for group in groups:
+                        scan_references(group, defined, used)
+                    # a worker looks up only the references its groups use.
+                    references = dict((name, self.references[name]) for name in used
+                                      if name in self.references)
+                    result = pool.apply_async(_load_partition,
+                        (url, self.model, self.loader_class, self.options,
+                         references, groups, defined))
+                    if serial:
+                        result.wait()
+                    results.append(result)
+                for result in results:
+                    references, partition_stats = result.get()
+                    self.references.update(references)
+                    stats.merge(partition_stats)
+        finally:
+            pool.close()
+            pool.join()
+        return stats
+
+    def loads(self, url, s):
+        """
+        Load a yaml string into the database at url.
+        """
+        data = parsers().load(s, Loader=self.yaml_loader_class or parsers().DefaultYamlLoader)
+        if data:
+            return self.from_list(url, data)
+        return LoadStats()
+
+    def loadf(self, url, filename):
+        """
+        Load a yaml file by filename into the database at url.
+        """
+        with open(filename) as f:
+            return self.loads(url, f.read())
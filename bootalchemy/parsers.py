@@ -0,0 +1,65 @@
+"""
+The yaml loader classes used to parse fixtures.
+
+This module imports PyYaml, so the rest of bootalchemy only imports it once a
+yaml fixture is actually read.
+"""
+from array import array
+from yaml import load, SafeLoader
+from yaml import (AliasEvent, ScalarEvent, SequenceStartEvent, SequenceEndEvent,
+                  MappingStartEvent, MappingEndEvent, StreamEndEvent,
+                  ScalarNode, SequenceNode, MappingNode)
+from yaml.composer import ComposerError
+
+# libyaml makes parsing several times faster, use it when PyYaml was built with it.
+try:
+    from yaml import CSafeLoader
+    from yaml.cyaml import CParser
+except ImportError:
+    CSafeLoader = CParser = None
+
+def construct_python_str(loader, node):
+    return loader.construct_scalar(node)
+
+def construct_positioned_seq(loader, node):
+    """
+    construct a sequence, and when the loader keeps positions and the sequence holds
+    mappings, the line and column of each mapping: two integers an item, in an array
+    stored under the id of the list.
+    """
+    data = []
+    yield data
+    data.extend(loader.construct_sequence(node))
+    if loader.positions is not None and node.value and isinstance(node.value[0], MappingNode):
+        marks = array('l')
+        for child in node.value:
+            marks.append(child.start_mark.line)
+            marks.append(child.start_mark.column)
+        loader.positions[id(data)] = marks
+
+class SafeFixtureLoader(SafeLoader):
+    """
+    yaml's SafeLoader, plus the python/str and python/unicode tags fixtures
+    written for the old default loader used to mark strings.  Set positions to a
+    dict to have the positions of the items of sequences kept in it.
+    """
+    positions = None
+
+SafeFixtureLoader.add_constructor('tag:yaml.org,2002:python/str', construct_python_str)
+SafeFixtureLoader.add_constructor('tag:yaml.org,2002:python/unicode', construct_python_str)
+SafeFixtureLoader.add_constructor('tag:yaml.org,2002:seq', construct_positioned_seq)
+
+if CSafeLoader is not None:
+    class CSafeFixtureLoader(CSafeLoader):
+        """
+        the libyaml version of SafeFixtureLoader.
+        """
+        positions = None
+
+    CSafeFixtureLoader.add_constructor('tag:yaml.org,2002:python/str', construct_python_str)
+    CSafeFixtureLoader.add_constructor('tag:yaml.org,2002:python/unicode', construct_python_str)
+    CSafeFixtureLoader.add_constructor('tag:yaml.org,2002:seq', construct_positioned_seq)
+    DefaultYamlLoader = CSafeFixtureLoader
+else:
+    CSafeFixtureLoader = None
+    DefaultYamlLoader = SafeFixtureLoader
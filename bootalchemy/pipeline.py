@@ -0,0 +1,231 @@
+"""
+Producing the groups of a streamed load on threads of their own.
+
+With pipeline set, a loader reads the groups of a streamed load through a
+Pipeline: one thread parses groups from the stream, a second casts their plain
+values to the column types, and the loading thread builds the objects and writes
+them, while the next groups are parsed and cast.  Each stage hands its groups on
+in order through a bounded queue, so a stage that gets ahead waits for the one
+after it rather than piling groups up in memory.
+
+Parsing a yaml file is Python code for the most part, which a thread can only
+run while the loading thread waits on the database.  YamlLoader.loadf parses in
+a process of its own instead, a ProcessGroups, and the parser thread just
+receives the groups it sends, so that parsing overlaps the whole load.
+
+Objects are only built and references only resolved on the loading thread, which
+owns the session and its connection, so references, nesting and the flush,
+commit and clear keys work as they do without the pipeline.
+"""
+import sys
+import time
+import queue
+import threading
+
+_done = object()
+
+# how often a waiting stage checks whether the pipeline was closed.
+poll_interval = 0.1
+
+class Failure(object):
+    """
+    an exception raised in a stage, handed on to be raised again by the loader.
+    """
+
+    def __init__(self, exc_info):
+        self.exc_info = exc_info
+
+class Stage(threading.Thread):
+    """
+       A thread putting the items of source, passed through func, on a queue.
+
+       *Arguments*
+          name
+            the name of the thread.
+          source
+            an iterable of items, read on this thread.
+          func
+            called with each item on this thread, or None to pass items on as they are.
+          size
+            most items waiting on the queue.
+          stopped
+            a threading.Event set when the pipeline is closed.
+
+       *Attributes*
+          seconds
+            time spent reading source, when there is no func, or in func.
+    """
+
+    def __init__(self, name, source, func, size, stopped):
+        threading.Thread.__init__(self, name=name)
+        self.daemon = True
+        self.source = source
+        self.func = func
+        self.queue = queue.Queue(size)
+        self.stopped = stopped
+        self.seconds = 0.0
+
+    def run(self):
+        try:
+            items = iter(self.source)
+            while True:
+                start = time.perf_counter()
+                item = next(items, _done)
+                if item is _done:
+                    break
+                if self.func is not None:
+                    start = time.perf_counter()
+                    item = self.func(item)
+                self.seconds += time.perf_counter() - start
+                if not self.put(item):
+                    return
+            self.put(_done)
+        except BaseException:
+            self.put(Failure(sys.exc_info()))
+
+    def put(self, item):
+        """
+        put item on the queue, waiting while it is full.  False if the pipeline was
+        closed first.
+        """
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=poll_interval)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def __iter__(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=poll_interval)
+            except queue.Empty:
+                if self.stopped.is_set():
+                    return
+                continue
+            if item is _done:
+                return
+            if isinstance(item, Failure):
+                exc_type, value, tb = item.exc_info
+                raise value.with_traceback(tb)
+            yield item
+
+def produce(func, args, output):
+    """
+    put ('item', item) on output for each item func(*args) yields, then ('done',),
+    or ('error', exception) if it fails.  The target of a ProcessGroups process.
+    """
+    try:
+        for item in func(*args):
+            output.put(('item', item))
+    except Exception as e:
+        try:
+            output.put(('error', e))
+        except Exception:
+            # an exception which does not pickle
+            output.put(('error', RuntimeError('%s: %s' % (e.__class__.__name__, e))))
+    else:
+        output.put(('done',))
+    output.close()
+    output.join_thread()
+
+class ProcessGroups(object):
+    """
+       The items func(*args) yields, produced in a process of their own, which starts
+       right away, and sent back over a bounded queue.
+
+       *Arguments*
+          func
+            a module level function, so that it can be sent to the process.
+          args
+            its arguments, which are sent to the process too.
+          size
+            most items waiting to be received.
+    """
+
+    def __init__(self, func, args=(), size=8):
+        # multiprocessing is only imported when it is used.
+        import multiprocessing
+        self.stopped = threading.Event()
+        self.queue = multiprocessing.Queue(size)
+        self.process = multiprocessing.Process(target=produce, args=(func, args, self.queue),
+                                               name='bootalchemy-parser')
+        self.process.daemon = True
+        self.process.start()
+
+    def __iter__(self):
+        while True:
+            try:
+                message = self.queue.get(timeout=poll_interval)
+            except queue.Empty:
+                if self.stopped.is_set():
+                    return
+                if not self.process.is_alive() and self.queue.empty():
+                    raise RuntimeError('the parser process exited with code %s' % self.process.exitcode)
+                continue
+            if message[0] == 'done':
+                return
+            if message[0] == 'error':
+                raise message[1]
+            yield message[1]
+
+    def stop(self):
+        """
+        stop the process, if it is still running.
+        """
+        self.stopped.set()
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.queue.close()
+
+class Pipeline(object):
+    """
+       Groups for from_list, parsed and cast on threads of their own.
+
+       *Arguments*
+          groups
+            an iterator of groups, such as YamlLoader.iter_groups returns, or a
+            ProcessGroups.  It is read on the parser thread.
+          cast
+            called with each group on the cast thread, or None for no cast stage.
+          size
+            most groups waiting between two stages.
+    """
+
+    def __init__(self, groups, cast=None, size=8):
+        self.groups = groups
+        self.stopped = threading.Event()
+        self.stages = [Stage('bootalchemy-parse', groups, None, size, self.stopped)]
+        if cast is not None:
+            self.stages.append(Stage('bootalchemy-cast', self.stages[0], cast, size, self.stopped))
+        self.started = False
+
+    @property
+    def parse_seconds(self):
+        return self.stages[0].seconds
+
+    @property
+    def cast_seconds(self):
+        return self.stages[1].seconds if len(self.stages) > 1 else 0.0
+
+    def __iter__(self):
+        if not self.started:
+            self.started = True
+            for stage in self.stages:
+                stage.start()
+        return iter(self.stages[-1])
+
+    def close(self):
+        """
+        stop the stages and wait for them to finish.  groups is stopped too if it has
+        a stop method, as a ProcessGroups does.
+        """
+        self.stopped.set()
+        stop = getattr(self.groups, 'stop', None)
+        if stop is not None:
+            stop()
+        if self.started:
+            for stage in self.stages:
+                stage.join()
@@ -0,0 +1,184 @@
+"""
+A reference store which does not keep the loaded objects alive.
+
+A plain dict of references holds on to every "&" named object until the load is
+done, so the session can never let go of them.  The ReferenceStore keeps an
+object only until it has been flushed, and then just its class and primary key,
+loading it again through the session when a "*" value asks for it.
+"""
+import weakref
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+from sqlalchemy.orm.attributes import instance_state
+
+class Identity(tuple):
+    """
+    (class number, primary key) of a stored object.  The primary key is the value
+    itself for a single column key, a tuple otherwise.
+    """
+    __slots__ = ()
+
+class Stored(object):
+    """
+    what ReferenceStore.peek returns for an object which has been flushed.
+    """
+    __slots__ = ('klass', 'pk')
+
+    def __init__(self, klass, pk):
+        self.klass = klass
+        self.pk = pk
+
+    def __repr__(self):
+        return '<%s %r>' % (self.klass.__name__, self.pk)
+
+class ReferenceStore(MutableMapping):
+    """
+       Compact Reference Store
+
+       *Arguments*
+          references
+            references to start with, a dict or another ReferenceStore.
+
+       *Attributes*
+          session
+            the session objects are loaded from, set by the loader for every load.
+            Only a weak reference is kept, so the store does not keep it open.
+    """
+
+    def __init__(self, references=None):
+        self._session = None
+        self._values = {}
+        self._pending = {}
+        self._classes = []
+        self._numbers = {}
+        if isinstance(references, ReferenceStore):
+            self.session = references.session
+            self._values.update(references._values)
+            self._pending.update(references._pending)
+            self._classes.extend(references._classes)
+            self._numbers.update(references._numbers)
+        elif references:
+            self.update(references)
+
+    def _get_session(self):
+        if self._session is None:
+            return None
+        return self._session()
+
+    def _set_session(self, session):
+        self._session = weakref.ref(session) if session is not None else None
+
+    session = property(_get_session, _set_session)
+
+    def _identity(self, value):
+        """
+        returns the Identity of a flushed object, None for an object not yet
+        flushed and False for a value which is not a mapped object.
+        """
+        try:
+            state = instance_state(value)
+        except AttributeError:
+            return False
+        if state.key is None:
+            return None
+        klass, pk = state.key[0], state.key[1]
+        number = self._numbers.get(klass)
+        if number is None:
+            number = self._numbers[klass] = len(self._classes)
+            self._classes.append(klass)
+        if len(pk) == 1:
+            pk = pk[0]
+        return Identity((number, pk))
+
+    def __setitem__(self, name, value):
+        self._pending.pop(name, None)
+        identity = self._identity(value)
+        if identity is None:
+            self._values.pop(name, None)
+            self._pending[name] = value
+        elif identity is False:
+            self._values[name] = value
+        else:
+            self._values[name] = identity
+
+    def __getitem__(self, name):
+        if name in self._pending:
+            return self._pending[name]
+        value = self._values[name]
+        if type(value) is Identity:
+            return self.get_object(value)
+        return value
+
+    def __delitem__(self, name):
+        if name in self._pending:
+            del self._pending[name]
+        else:
+            del self._values[name]
+
+    def __contains__(self, name):
+        return name in self._values or name in self._pending
+
+    def __iter__(self):
+        for name in self._values:
+            yield name
+        for name in self._pending:
+            yield name
+
+    def __len__(self):
+        return len(self._values) + len(self._pending)
+
+    def get_object(self, identity):
+        number, pk = identity
+        session = self.session
+        klass = self._classes[number]
+        get = getattr(session, 'get', None)
+        if get is not None:
+            return get(klass, pk)
+        return session.query(klass).get(pk)
+
+    def peek(self, name):
+        """
+        returns what is stored under name without loading anything: the object or
+        value, or a Stored for a flushed object.
+        """
+        if name in self._pending:
+            return self._pending[name]
+        value = self._values[name]
+        if type(value) is Identity:
+            return Stored(self._classes[value[0]], value[1])
+        return value
+
+    def is_pending(self, name):
+        """
+        True if the object stored under name has not been flushed yet.
+        """
+        if name in self._pending:
+            self.compact()
+        return name in self._pending
+
+    def key(self, name):
+        """
+        returns the primary key of the object stored under name, or the value
+        itself if it is not an object, without loading anything.  The object
+        has to have been flushed.
+        """
+        value = self._values[name]
+        if type(value) is Identity:
+            return value[1]
+        return value
+
+    def compact(self):
+        """
+        replace the objects which have been flushed since they were stored by their
+        identity.  Called after every flush.
+        """
+        if not self._pending:
+            return
+        for name, value in list(self._pending.items()):
+            identity = self._identity(value)
+            if identity:
+                del self._pending[name]
+                self._values[name] = identity
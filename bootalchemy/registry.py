@@ -0,0 +1,117 @@
+"""
+Looking up model classes by the names used in fixtures.
+"""
+import importlib
+
+def declarative_classes(base):
+    """
+    returns the classes in the registry of a declarative base, or None if base
+    is not one.
+    """
+    registry = getattr(base, '_decl_class_registry', None)
+    if registry is None:
+        registry = getattr(getattr(base, 'registry', None), '_class_registry', None)
+    if registry is None:
+        return None
+    return [klass for klass in list(registry.values()) if isinstance(klass, type)]
+
+class ClassRegistry(object):
+    """
+       Memoized class lookup for a Loader.
+
+       Names are looked up in the model modules first, as attributes, and then in the
+       registries of the declarative bases given in the model or found in its modules.
+       A dotted name, module.Class, picks the class from the module whose name is, or
+       ends with, module.  Every result is remembered, misses included.  Nothing is
+       imported or scanned until the first lookup.
+
+       *Arguments*
+          model
+            a module, module name or declarative base, or a list of them.
+    """
+
+    def __init__(self, model):
+        if not isinstance(model, list):
+            model = [model]
+        self.model = model
+        self._modules = None
+        self._mapped = None
+        self._names = {}
+
+    @property
+    def modules(self):
+        """
+        the model modules, imported on first use.
+        """
+        if self._modules is None:
+            self._modules = [importlib.import_module(item) if isinstance(item, str) else item
+                             for item in self.model]
+        return self._modules
+
+    def mapped_classes(self):
+        """
+        returns a dict of names to the classes of the declarative bases in the model.
+        Names used by more than one class map to None.
+        """
+        if self._mapped is not None:
+            return self._mapped
+        mapped = {}
+        seen = set()
+        def add(name, klass):
+            if mapped.get(name, klass) is not klass:
+                klass = None
+            mapped[name] = klass
+        for item in self.modules:
+            bases = [item]
+            if not isinstance(item, type):
+                bases = list(getattr(item, '__dict__', {}).values())
+            for base in bases:
+                classes = declarative_classes(base)
+                if not classes or id(base) in seen:
+                    continue
+                seen.add(id(base))
+                for klass in classes:
+                    add(klass.__name__, klass)
+                    add('%s.%s' % (klass.__module__, klass.__name__), klass)
+        self._mapped = mapped
+        return mapped
+
+    def get(self, name):
+        """
+        returns the class called name, or None.
+        """
+        try:
+            return self._names[name]
+        except KeyError:
+            pass
+        klass = self._names[name] = self._lookup(name)
+        return klass
+
+    def _lookup(self, name):
+        if '.' in name:
+            module_name, klass_name = name.rsplit('.', 1)
+            for module in self.modules:
+                if module.__name__ == module_name or module.__name__.endswith('.' + module_name):
+                    klass = getattr(module, klass_name, None)
+                    if klass is not None:
+                        return klass
+            mapped = self.mapped_classes()
+            if name in mapped:
+                return mapped[name]
+            matches = set(klass for key, klass in mapped.items()
+                          if klass is not None and key.endswith('.' + name))
+            if len(matches) == 1:
+                return matches.pop()
+            return None
+        for module in self.modules:
+            klass = getattr(module, name, None)
+            if klass is not None:
+                return klass
+        return self.mapped_classes().get(name)
+
+    def clear(self):
+        """
+        forget the names looked up so far, after classes were added to the model.
+        """
+        self._names = {}
+        self._mapped = None
@@ -0,0 +1,203 @@
+"""
+Fixture databases which are loaded once and copied for every test.
+
+A FixtureSnapshot loads a set of fixture files into a template database the
+first time it is asked for one, and hands out clones of it afterwards: a copy of
+the file for SQLite, CREATE DATABASE ... TEMPLATE for PostgreSQL.  The template is
+named after a hash of the fixtures, the schema and the loader options, so a
+change to any of them builds a new one, and an unchanged one is shared by every
+process using the same directory or server.
+
+Wrapped in a pytest fixture::
+
+    snapshot = FixtureSnapshot('sqlite://', model.metadata, model, ['users.yaml'])
+
+    @pytest.fixture
+    def db_url():
+        url = snapshot.clone()
+        yield url
+        snapshot.drop(url)
+"""
+import os
+import uuid
+import shutil
+import hashlib
+import tempfile
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateTable
+
+from . import __version__
+
+def _with_database(url, database):
+    if hasattr(url, 'set'):
+        return url.set(database=database)
+    url = make_url(str(url))
+    url.database = database
+    return url
+
+class FixtureSnapshot(object):
+    """
+       Fixture Snapshot
+
+       *Arguments*
+          url
+            engine url of the database server.  Only the dialect is used for SQLite;
+            for PostgreSQL it is where the CREATE DATABASE statements are run, so it
+            must not name the template itself.
+          metadata
+            the MetaData whose tables are created in the template.
+          model
+            passed to the loaders, as for :class:`bootalchemy.loader.Loader`.
+          fixtures
+            fixture file names, loaded in order with the loader for their extension
+            as the bootalchemy command does.  References carry over from file to file.
+          directory
+            where SQLite templates and clones are kept.  Defaults to a bootalchemy
+            directory in the system temporary directory.
+          options
+            keyword arguments for the loaders.
+    """
+
+    def __init__(self, url, metadata, model, fixtures, directory=None, **options):
+        self.url = make_url(url)
+        self.metadata = metadata
+        self.model = model
+        self.fixtures = list(fixtures)
+        if directory is None:
+            directory = os.path.join(tempfile.gettempdir(), 'bootalchemy-snapshots')
+        self.directory = directory
+        self.options = options
+        self._key = None
+
+    @property
+    def dialect_name(self):
+        return self.url.get_dialect().name
+
+    @property
+    def key(self):
+        """
+        hash of the fixture contents, the schema and the loader options.
+        """
+        if self._key is None:
+            h = hashlib.sha1()
+            h.update(('%s:%s:%r\n' % (__version__, self.model, sorted(self.options.items()))).encode('utf-8'))
+            dialect = self.url.get_dialect()()
+            for table in self.metadata.sorted_tables:
+                h.update(str(CreateTable(table).compile(dialect=dialect)).encode('utf-8'))
+            for filename in self.fixtures:
+                h.update(os.path.basename(filename).encode('utf-8'))
+                with open(filename, 'rb') as f:
+                    h.update(f.read())
+            self._key = h.hexdigest()
+        return self._key
+
+    def load(self, url):
+        """
+        create the tables in the database at url and load the fixtures into it.
+        """
+        # imported here as the loaders import most of bootalchemy
+        from .formats import loaders
+        engine = create_engine(url)
+        try:
+            self.metadata.create_all(bind=engine)
+            session = sessionmaker(bind=engine)()
+            references = {}
+            for filename in self.fixtures:
+                ext = os.path.splitext(filename)[1].lower()
+                if ext not in loaders:
+                    raise ValueError('do not know how to load %s files (%s)' % (ext, filename))
+                loader = loaders[ext](self.model, references=references, **self.options)
+                loader.loadf(session, filename)
+                references = loader._references
+            session.commit()
+            session.close()
+        finally:
+            engine.dispose()
+
+    def template(self):
+        """
+        returns the url of the template database, loading it if it does not exist yet.
+        """
+        if self.dialect_name == 'sqlite':
+            return self._sqlite_template()
+        if self.dialect_name == 'postgresql':
+            return self._postgresql_template()
+        raise ValueError('snapshots are not supported on %s' % self.dialect_name)
+
+    def clone(self, name=None):
+        """
+        returns the url of a new copy of the template database.  name is the file or
+        database name of the copy, made up from the key if not given.
+        """
+        template = self.template()
+        if name is None:
+            name = 'bootalchemy_%s_%s' % (self.key[:12], uuid.uuid4().hex[:8])
+        if self.dialect_name == 'sqlite':
+            if not os.path.isabs(name):
+                name = os.path.join(self.directory, name + '.sqlite')
+            shutil.copyfile(template.database, name)
+            return _with_database(self.url, name)
+        self._execute('CREATE DATABASE "%s" TEMPLATE "%s"' % (name, template.database))
+        return _with_database(self.url, name)
+
+    def drop(self, url):
+        """
+        remove a clone.
+        """
+        url = make_url(str(url))
+        if self.dialect_name == 'sqlite':
+            if os.path.exists(url.database):
+                os.remove(url.database)
+        else:
+            self._execute('DROP DATABASE IF EXISTS "%s"' % url.database)
+
+    def _sqlite_template(self):
+        path = os.path.join(self.directory, self.key + '.sqlite')
+        if not os.path.exists(path):
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            # load into a file of our own and move it into place, so another process
+            # never sees a half loaded template.
+            fd, building = tempfile.mkstemp(suffix='.sqlite', dir=self.directory)
+            os.close(fd)
+            try:
+                self.load(_with_database(self.url, building))
+                os.replace(building, path)
+            finally:
+                if os.path.exists(building):
+                    os.remove(building)
+        return _with_database(self.url, path)
+
+    def _execute(self, statement):
+        # CREATE and DROP DATABASE can not run in a transaction.
+        engine = create_engine(self.url, isolation_level='AUTOCOMMIT')
+        try:
+            with engine.connect() as connection:
+                connection.execute(text(statement))
+        finally:
+            engine.dispose()
+
+    def _exists(self, name):
+        engine = create_engine(self.url)
+        try:
+            with engine.connect() as connection:
+                return connection.execute(text('SELECT 1 FROM pg_database WHERE datname = :name'),
+                                          {'name': name}).scalar() is not None
+        finally:
+            engine.dispose()
+
+    def _postgresql_template(self):
+        name = 'bootalchemy_%s' % self.key[:20]
+        if not self._exists(name):
+            building = '%s_%s' % (name, uuid.uuid4().hex[:8])
+            self._execute('CREATE DATABASE "%s"' % building)
+            try:
+                self.load(_with_database(self.url, building))
+                if not self._exists(name):
+                    self._execute('ALTER DATABASE "%s" RENAME TO "%s"' % (building, name))
+            finally:
+                self._execute('DROP DATABASE IF EXISTS "%s"' % building)
+        return _with_database(self.url, name)
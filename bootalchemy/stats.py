@@ -0,0 +1,85 @@
+"""
+Statistics gathered while loading.
+"""
+
+class LoadStats(object):
+    """
+       Returned by from_list, loads and loadf.
+
+       *Attributes*
+          rows
+            dict of class names to the number of rows loaded, nested objects included.
+          times
+            seconds spent parsing, in _check_types, in create_obj, flushing and in
+            bulk mode writes.  With pipeline set, 'wait' is the time the loading
+            thread spent waiting for parsed groups.
+          flushes
+            number of flushes the loader issued, commits not included.
+          flushes_saved
+            number of per-row reference flushes that were not needed.
+          commits
+            number of commits.
+          groups
+            number of groups loaded.
+          skipped_groups
+            number of unchanged groups an incremental load skipped.
+          updated, unchanged
+            number of rows merge mode found in the database, and changed or left alone.
+          peak_references
+            largest number of references held at once.
+    """
+    phases = ('parse', 'check_types', 'create_obj', 'flush', 'write')
+
+    def __init__(self):
+        self.rows = {}
+        self.times = dict((phase, 0.0) for phase in self.phases)
+        self.flushes = 0
+        self.flushes_saved = 0
+        self.commits = 0
+        self.groups = 0
+        self.skipped_groups = 0
+        self.peak_references = 0
+        self.updated = 0
+        self.unchanged = 0
+
+    @property
+    def total_rows(self):
+        return sum(self.rows.values())
+
+    def add_rows(self, klass, count=1):
+        name = klass.__name__
+        self.rows[name] = self.rows.get(name, 0) + count
+
+    def merge(self, other):
+        """
+        add the numbers of other to these, for several loads making up one.
+        """
+        for name, count in other.rows.items():
+            self.rows[name] = self.rows.get(name, 0) + count
+        for phase, seconds in other.times.items():
+            self.times[phase] = self.times.get(phase, 0.0) + seconds
+        self.flushes += other.flushes
+        self.flushes_saved += other.flushes_saved
+        self.commits += other.commits
+        self.groups += other.groups
+        self.skipped_groups += other.skipped_groups
+        self.updated += other.updated
+        self.unchanged += other.unchanged
+        self.peak_references = max(self.peak_references, other.peak_references)
+        return self
+
+    def as_dict(self):
+        return {'rows': dict(self.rows),
+                'times': dict(self.times),
+                'flushes': self.flushes,
+                'flushes_saved': self.flushes_saved,
+                'commits': self.commits,
+                'groups': self.groups,
+                'skipped_groups': self.skipped_groups,
+                'peak_references': self.peak_references,
+                'updated': self.updated,
+                'unchanged': self.unchanged,
+                }
+
+    def __repr__(self):
+        return '<LoadStats: %d rows, %d flushes, %d commits>' % (self.total_rows, self.flushes, self.commits)
@@ -0,0 +1,152 @@
+"""
+Writers insert batches of rows that are already cast and keyed by column, as
+collected by the loader's bulk mode.  Each writer uses a different way of getting
+rows into the database:
+
+ExecuteManyWriter
+    one INSERT executed with a list of parameter sets, which works everywhere.
+MultiValuesWriter
+    INSERT ... VALUES (...), (...), ... statements of as many rows as the bound
+    parameter limit allows.
+CopyWriter
+    PostgreSQL's COPY ... FROM STDIN, fed from an in-memory buffer.  The Python side
+    column defaults an INSERT would apply are filled in first.
+"""
+import io
+import datetime
+
+class Writer(object):
+    """
+    Base class for writers.
+    """
+
+    def write(self, session, table, rows):
+        """
+        insert rows, a list of dicts with the same column keys, into table using the
+        session's connection.
+        """
+        raise NotImplementedError
+
+class ExecuteManyWriter(Writer):
+
+    def write(self, session, table, rows):
+        session.execute(table.insert(), rows)
+
+class MultiValuesWriter(Writer):
+    """
+       *Arguments*
+          max_parameters
+            the most bound parameters to put in one statement.  The default suits
+            SQLite's lowest limit.
+    """
+
+    def __init__(self, max_parameters=999):
+        self.max_parameters = max_parameters
+
+    def write(self, session, table, rows):
+        per_statement = max(1, self.max_parameters // max(1, len(rows[0])))
+        for start in range(0, len(rows), per_statement):
+            session.execute(table.insert().values(rows[start:start + per_statement]))
+
+def copy_text(value):
+    """
+    format a value for COPY's text format.
+    """
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if isinstance(value, bytes):
+        return '\\\\x' + value.hex()
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat(' ')
+    elif isinstance(value, list):
+        value = '{%s}' % ','.join('NULL' if item is None else
+                                  '"%s"' % str(item).replace('\\', '\\\\').replace('"', '\\"')
+                                  for item in value)
+    else:
+        value = str(value)
+    return (value.replace('\\', '\\\\').replace('\t', '\\t')
+                 .replace('\n', '\\n').replace('\r', '\\r'))
+
+class DefaultContext(object):
+    """
+    stands in for the execution context a context sensitive column default is called
+    with, holding the parameters of one row.
+    """
+
+    def __init__(self, row):
+        self.current_parameters = row
+
+    def get_current_parameters(self, isolate_multiinsert_groups=True):
+        return self.current_parameters
+
+def fill_defaults(table, rows):
+    """
+    returns rows with the scalar and callable Python side defaults of the columns of
+    table they leave out filled in, as an INSERT would fill them in.  Raises
+    ValueError for a column whose default has to run in the database: a Sequence
+    or a SQL expression which is not a server_default.
+    """
+    missing = [column for column in table.columns
+               if column.key not in rows[0] and column.default is not None]
+    if not missing:
+        return rows
+    for column in missing:
+        default = column.default
+        if default.is_sequence or default.is_clause_element:
+            raise ValueError('the default of %s cannot be applied to copied rows; give it '
+                             'a value or use another writer' % column)
+    filled = []
+    for row in rows:
+        row = dict(row)
+        for column in missing:
+            default = column.default
+            if default.is_callable:
+                row[column.key] = default.arg(DefaultContext(row))
+            else:
+                row[column.key] = default.arg
+        filled.append(row)
+    return filled
+
+class CopyWriter(Writer):
+    """
+    Streams rows through COPY ... FROM STDIN.  Needs psycopg2 or psycopg 3.
+    """
+
+    def write(self, session, table, rows):
+        rows = fill_defaults(table, rows)
+        connection = session.connection()
+        preparer = connection.dialect.identifier_preparer
+        keys = list(rows[0])
+        sql = 'COPY %s (%s) FROM STDIN' % (preparer.format_table(table),
+                                          ', '.join(preparer.quote(table.c[key].name) for key in keys))
+        buf = io.StringIO()
+        for row in rows:
+            buf.write('\t'.join(copy_text(row[key]) for key in keys))
+            buf.write('\n')
+        buf.seek(0)
+        cursor = connection.connection.cursor()
+        try:
+            if hasattr(cursor, 'copy_expert'):
+                cursor.copy_expert(sql, buf)
+            else:
+                with cursor.copy(sql) as copy:
+                    copy.write(buf.getvalue())
+        finally:
+            cursor.close()
+
+default_writer = ExecuteManyWriter()
+
+def get_writer(writer, dialect_name):
+    """
+    returns the writer to use for a dialect.  writer may be None for the default,
+    a Writer, or a dict of dialect names to writers with an optional 'default' entry.
+    """
+    if isinstance(writer, dict):
+        writer = writer.get(dialect_name, writer.get('default'))
+    if writer is None:
+        return default_writer
+    return writer
@@ -17,7 +17,7 @@ setup(name='bootalchemy',
       author_email='chris@percious.com',
       url='',
       license='MIT',
-      packages=find_packages(exclude=['ez_setup', 'examples', 'tests']),
+      packages=find_packages(exclude=['ez_setup', 'examples', 'tests', 'benchmarks']),
       include_package_data=True,
       zip_safe=True,
       install_requires=[
@@ -27,5 +27,7 @@ setup(name='bootalchemy',
       ],
       entry_points="""
       # -*- Entry points: -*-
+      [console_scripts]
+      bootalchemy = bootalchemy.cli:main
       """,
       )
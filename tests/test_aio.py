@@ -0,0 +1,157 @@
+import os
+import shutil
+import asyncio
+import tempfile
+from unittest import SkipTest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+try:
+    import aiosqlite
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+except ImportError:
+    create_async_engine = None
+
+from bootalchemy.loader import YamlLoader
+from bootalchemy.aio import AsyncYamlLoader
+
+import model
+from test_loader import test_file, nested_test_file
+
+def dump(session):
+    return ([x.json for x in session.query(model.Group).order_by(model.Group.group_id)],
+            [x.json for x in session.query(model.User).order_by(model.User.user_id)],
+            sorted((u.user_name, g.name) for u in session.query(model.User) for g in u.groups))
+
+class TestCastGroups:
+
+    def test_plain_values(self):
+        loader = AsyncYamlLoader(model)
+        data = [{'User': [{'user_name': None, 'active': 'No', 'groups': ['*g']},
+                          {'&u': {'user_name': 'sue', 'active': 'y', 'user_id': '&sue_id'}}]},
+                {'flush': None}]
+        loader.cast_groups(data)
+        assert data[0]['User'][0] == {'user_name': '', 'active': False, 'groups': ['*g']}, data
+        assert data[0]['User'][1] == {'&u': {'user_name': 'sue', 'active': True, 'user_id': '&sue_id'}}, data
+
+    def test_cast_copy(self):
+        loader = AsyncYamlLoader(model)
+        data = [{'User': [{'active': 'No', 'groups': ['*g']}, {'&u': {'active': 'y'}}]}, {'flush': None}]
+        copied, seconds = loader._cast_copy(data)
+        assert copied == [{'User': [{'active': False, 'groups': ['*g']}, {'&u': {'active': True}}]},
+                          {'flush': None}], copied
+        assert data == [{'User': [{'active': 'No', 'groups': ['*g']}, {'&u': {'active': 'y'}}]},
+                        {'flush': None}], data
+
+    def test_defaults_to_batched_flushes(self):
+        assert AsyncYamlLoader(model, batch_size=10).flush_every == 10
+        assert AsyncYamlLoader(model, commit_every=5).flush_every is None
+
+class TestPrecastLoad:
+
+    def setup_method(self):
+        self.directory = tempfile.mkdtemp()
+        self.engines = []
+
+    def teardown_method(self):
+        for engine in self.engines:
+            engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def session(self, name):
+        engine = create_engine('sqlite:///' + os.path.join(self.directory, name))
+        self.engines.append(engine)
+        model.metadata.create_all(bind=engine)
+        return sessionmaker(bind=engine)()
+
+    def test_same_rows(self):
+        # the rows built from data cast up front are those YamlLoader builds.
+        for filename in (test_file, nested_test_file):
+            expected = self.session('expected.db')
+            YamlLoader(model).loadf(expected, filename)
+            expected.commit()
+            session = self.session('precast.db')
+            loader = AsyncYamlLoader(model)
+            data = loader.cast_groups(loader.read(filename))
+            loader._precast = True
+            loader._from_list(session, data)
+            session.commit()
+            assert dump(session) == dump(expected), (dump(session), dump(expected))
+            session.close()
+            expected.close()
+            for engine in self.engines:
+                model.metadata.drop_all(bind=engine)
+
+class TestAsyncYamlLoader:
+
+    def setup_method(self):
+        if create_async_engine is None:
+            raise SkipTest('needs SQLAlchemy 1.4 and aiosqlite')
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'async.db')
+        self.engine = create_engine('sqlite:///' + self.path)
+        model.metadata.create_all(bind=self.engine)
+
+    def teardown_method(self):
+        self.engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def load(self, *args, **kw):
+        async def load():
+            engine = create_async_engine('sqlite+aiosqlite:///' + self.path)
+            try:
+                async with AsyncSession(engine) as session:
+                    stats = await AsyncYamlLoader(model, flush_every=2).loadf(session, *args, **kw)
+                    await session.commit()
+                    return stats
+            finally:
+                await engine.dispose()
+        return asyncio.run(load())
+
+    def expected(self, filename):
+        engine = create_engine('sqlite://')
+        model.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        YamlLoader(model).loadf(session, filename)
+        try:
+            return dump(session)
+        finally:
+            session.close()
+            engine.dispose()
+
+    def dump(self):
+        session = sessionmaker(bind=self.engine)()
+        try:
+            return dump(session)
+        finally:
+            session.close()
+
+    def test_loadf(self):
+        stats = self.load(test_file)
+        assert stats.groups == 3, stats.as_dict()
+        assert self.dump() == self.expected(test_file)
+
+    def test_loadf_nested(self):
+        self.load(nested_test_file)
+        assert self.dump() == self.expected(nested_test_file)
+
+    def test_from_list(self):
+        data = [{'Group': [{'name': 'a', 'display_name': None}]}]
+        async def load():
+            engine = create_async_engine('sqlite+aiosqlite:///' + self.path)
+            try:
+                async with AsyncSession(engine) as session:
+                    stats = await AsyncYamlLoader(model).from_list(session, data)
+                    await session.commit()
+                    return stats
+            finally:
+                await engine.dispose()
+        stats = asyncio.run(load())
+        assert stats.rows == {'Group': 1}, stats.as_dict()
+        assert data == [{'Group': [{'name': 'a', 'display_name': None}]}], data
+        assert self.dump()[0] == [{'display_name': '', 'group_id': 1, 'name': 'a'}], self.dump()
+
+    def test_stream(self):
+        self.load(test_file, stream=True)
+        assert self.dump() == self.expected(test_file)
@@ -0,0 +1,16 @@
+from benchmarks.generate import generate
+from benchmarks.run import run
+
+def test_generate_is_deterministic():
+    assert generate(rows=50, nesting_depth=2, seed=3) == generate(rows=50, nesting_depth=2, seed=3)
+    assert generate(rows=50, seed=3) != generate(rows=50, seed=4)
+
+def test_run():
+    results = run(rows=20, nesting_depth=1, mode_names=['orm', 'compiled'], database_names=['memory'])
+    assert [(r['mode'], r['rows']) for r in results['results']] == [('orm', 52), ('compiled', 52)], results
+    assert results['results'][0]['peak_memory'] > 0
+
+def test_imports():
+    from benchmarks.imports import run as run_imports
+    results = run_imports(repeat=1, names=['cli', 'loader'])
+    assert [(r['name'], r['modules']) for r in results['results']] == [('cli', []), ('loader', [])], results
@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+
+from bootalchemy.cache import FixtureCache
+from bootalchemy.loader import YamlLoader
+
+import model
+from test_loader import Session
+
+class TestFixtureCache:
+
+    def setup_method(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = FixtureCache(self.directory, max_size=None)
+
+    def teardown_method(self):
+        shutil.rmtree(self.directory)
+
+    def test_roundtrip(self):
+        key = self.cache.key(b'- User: []', None)
+        assert self.cache.get(key) is None
+        self.cache.put(key, [{'User': []}])
+        assert self.cache.get(key) == [{'User': []}]
+
+    def test_key_depends_on_parser(self):
+        assert self.cache.key(b'x', YamlLoader) != self.cache.key(b'x', FixtureCache)
+        assert self.cache.key(b'x', YamlLoader) != self.cache.key(b'y', YamlLoader)
+
+    def test_failed_put_leaves_no_file(self):
+        class Unpicklable(object):
+            def __reduce__(self):
+                raise KeyboardInterrupt
+        try:
+            self.cache.put('k', Unpicklable())
+        except KeyboardInterrupt:
+            pass
+        else:
+            assert False, 'the interrupt should have been raised'
+        assert os.listdir(self.directory) == [], os.listdir(self.directory)
+
+    def test_eviction(self):
+        self.cache.max_size = 0
+        self.cache.put('a', list(range(100)))
+        assert self.cache.entries() == []
+
+    def test_loadf_uses_cache(self):
+        filename = os.path.join(self.directory, 'groups.yaml')
+        with open(filename, 'w') as f:
+            f.write('- Group:\n  - {name: parsed}\n')
+        loader = YamlLoader(model, cache=self.directory)
+        session = Session()
+        loader.loadf(session, filename)
+        ((mtime, size, path),) = loader.cache.entries()
+        key = os.path.basename(path)[:-len(FixtureCache.suffix)]
+        loader.cache.put(key, [{'Group': [{'name': 'cached'}]}])
+        loader.loadf(session, filename)
+        r = [g.name for g in session.query(model.Group).order_by(model.Group.group_id)]
+        session.rollback()
+        assert r == ['parsed', 'cached'], r
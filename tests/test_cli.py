@@ -0,0 +1,72 @@
+import io
+import os
+import shutil
+import tempfile
+import contextlib
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from bootalchemy.cli import main
+
+import model
+
+test_file = os.path.dirname(__file__)+'/data/test_data.yaml'
+
+class TestCli:
+
+    def setup_method(self):
+        self.directory = tempfile.mkdtemp()
+        self.url = 'sqlite:///' + os.path.join(self.directory, 'cli.db')
+        self.engine = create_engine(self.url)
+        model.metadata.create_all(bind=self.engine)
+
+    def teardown_method(self):
+        self.engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def count_users(self):
+        session = sessionmaker(bind=self.engine)()
+        try:
+            return session.query(model.User).count()
+        finally:
+            session.close()
+
+    def test_load(self):
+        csv_file = os.path.join(self.directory, 'Group.csv')
+        with open(csv_file, 'w') as f:
+            f.write('name\nfrom_csv\n')
+        assert main(['-m', 'model', '--commit-interval', '1', self.url, test_file, csv_file]) == 0
+        assert self.count_users() == 6
+
+    def test_stats_and_profile(self):
+        profile = os.path.join(self.directory, 'load.prof')
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            main(['-m', 'model', '--stats', '--profile', profile, self.url, test_file])
+        phases = [line.split()[0] for line in err.getvalue().splitlines()]
+        assert phases == ['parse', 'cast', 'construct', 'flush', 'write', 'total',
+                          'rows', 'flushes', 'commits'], err.getvalue()
+        assert err.getvalue().splitlines()[6].split() == ['rows', '11'], err.getvalue()
+        assert os.path.exists(profile)
+
+    def test_parallel_stats(self):
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            assert main(['-m', 'model', '--parallel', '2', '--stats', self.url, test_file]) == 0
+        assert err.getvalue().splitlines()[6].split() == ['rows', '11'], err.getvalue()
+        assert self.count_users() == 6
+
+    def test_pipeline(self):
+        csv_file = os.path.join(self.directory, 'Group.csv')
+        with open(csv_file, 'w') as f:
+            f.write('name\nfrom_csv\n')
+        assert main(['-m', 'model', '--pipeline', '2', self.url, test_file, csv_file]) == 0
+        assert self.count_users() == 6
+
+    def test_expunge(self):
+        for flags in (['--expunge'], ['--expunge', '--compact-references']):
+            model.metadata.drop_all(bind=self.engine)
+            model.metadata.create_all(bind=self.engine)
+            assert main(['-m', 'model', '--flush-every', '2'] + flags + [self.url, test_file]) == 0
+            assert self.count_users() == 6
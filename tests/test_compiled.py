@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+
+import yaml
+
+from bootalchemy.loader import DefaultYamlLoader
+from bootalchemy.compiled import CompiledLoader, compile_data, compile_file, dumps, REF, DEFINE
+
+import model
+from test_loader import Session, TestYamlLoader, test_file
+
+class TestCompiledLoader(TestYamlLoader):
+
+    def setup_method(self):
+        self.loader = CompiledLoader(model)
+        self.loader.loads = self.compile_and_load
+        self.session = Session()
+
+    def compile_and_load(self, session, s):
+        artifact = compile_data(self.loader, yaml.load(s, Loader=DefaultYamlLoader))
+        return CompiledLoader.loads(self.loader, session, dumps(artifact))
+
+    def test_compile_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            target = os.path.join(directory, 'test_data.bin')
+            version, classes, slots, groups = compile_file(self.loader, test_file, target)
+            assert classes == ['User', 'Group'], classes
+            assert slots[:2] == ['id', 'students_group'], slots
+            blocks, controls = groups[0]
+            assert controls == {'flush': None, 'commit': None}, controls
+            assert blocks[0] == (0, [(None, {'user_id': (DEFINE, 0, None), 'user_name': 'peggy', 'active': False}, [('user_id', 0)]),
+                                     (None, {'user_name': 'sue', 'active': True}, None)]), blocks[0]
+            ref_slot, values, attribute_refs = groups[2][0][0][1][3]
+            assert values['groups'] == [(REF, slots.index('bullies_group'))], values
+            CompiledLoader(model).loadf(self.session, target)
+            assert self.session.query(model.User).count() == 6
+        finally:
+            shutil.rmtree(directory)
+
+    def test_refuses_options_it_ignores(self):
+        for option in ('bulk', 'merge', 'incremental'):
+            try:
+                CompiledLoader(model, **{option: True})
+            except ValueError:
+                pass
+            else:
+                assert False, '%s should have been refused' % option
@@ -0,0 +1,43 @@
+import datetime
+
+from bootalchemy.converters import timestamp, timeonly, memoize, convert_column, ConverterError
+
+def test_timestamp():
+    assert timestamp('2020-01-31') == datetime.date(2020, 1, 31)
+    assert timestamp('2020-1-5') == datetime.date(2020, 1, 5)
+    assert timestamp('2020-01-31 10:00:00') == datetime.datetime(2020, 1, 31, 10)
+    assert timestamp('2020-01-31t10:00:00.123') == datetime.datetime(2020, 1, 31, 10, 0, 0, 123000)
+    assert timestamp('2020-01-31T10:00:00Z') == datetime.datetime(2020, 1, 31, 10)
+    # offsets are taken off, leaving a naive datetime
+    assert timestamp('2020-01-31T10:00:00.5+05:30') == datetime.datetime(2020, 1, 31, 4, 30, 0, 500000)
+    assert timestamp('2020-01-31T10:00:00-01:00') == datetime.datetime(2020, 1, 31, 11)
+    assert timestamp('2020-01-31 10:00:00 +5') == datetime.datetime(2020, 1, 31, 5)
+    for value in ('20200131', '2020-W01-1', '2020-01-31T10:00', '2020-01-31x10:00:00'):
+        try:
+            timestamp(value)
+        except ConverterError:
+            pass
+        else:
+            assert False, value
+
+def test_timeonly():
+    assert timeonly('10:05') == datetime.time(10, 5)
+    assert timeonly('9:05:01.25') == datetime.time(9, 5, 1, 250000)
+    try:
+        timeonly('10:05+01:00')
+    except ConverterError:
+        pass
+    else:
+        assert False
+
+def test_memoize():
+    convert = memoize(timestamp, 2)
+    assert convert('2020-01-31') is convert('2020-01-31')
+    assert convert.cache_info().hits == 1
+    convert('2020-02-01')
+    convert('2020-02-02')
+    assert convert.cache_info().currsize == 2
+
+def test_convert_column():
+    values = ['10:00', None, '10:00', '11:30']
+    assert convert_column(timeonly, values) == [datetime.time(10), None, datetime.time(10), datetime.time(11, 30)]
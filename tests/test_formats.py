@@ -0,0 +1,43 @@
+import json
+
+from bootalchemy.loader import JsonLoader, NdjsonLoader, CsvLoader
+
+import model
+from test_loader import Session, TestYamlLoader
+
+class TestFormats:
+
+    def setup_method(self):
+        self.session = Session()
+
+    teardown_method = TestYamlLoader.teardown_method
+
+    def users(self):
+        users = self.session.query(model.User).order_by(model.User.user_id).all()
+        return [(u.user_id, u.user_name, u.active, [g.name for g in u.groups]) for u in users]
+
+    def test_json(self):
+        data = [{'Group': [{'&students': {'name': 'students'}}], 'flush': None},
+                {'User': [{'user_name': 'sue', 'active': 'Y', 'groups': ['*students']}]}]
+        JsonLoader(model).loads(self.session, json.dumps(data))
+        assert self.users() == [(1, 'sue', True, ['students'])], self.users()
+
+    def test_ndjson(self):
+        loader = NdjsonLoader(model, chunk_size=2)
+        s = '\n'.join(['{"Group": {"&students": {"name": "students"}}}',
+                       '{"flush": null}',
+                       '',
+                       '{"User": {"user_name": "sue", "groups": ["*students"]}}',
+                       '{"User": {"user_name": "bob", "active": "n"}}',
+                       '{"User": {"user_name": "ann", "active": true}}'])
+        groups = list(loader.iter_groups(s.splitlines()))
+        assert [list(g.keys()) for g in groups] == [['Group'], ['flush'], ['User'], ['User']], groups
+        loader.loads(self.session, s)
+        assert self.users() == [(1, 'sue', None, ['students']), (2, 'bob', False, []), (3, 'ann', True, [])], self.users()
+
+    def test_csv(self):
+        s = 'user_id,user_name,active\n&sue,sue,Y\n,bob,\n'
+        loader = CsvLoader(model)
+        loader.loads(self.session, s, 'User')
+        assert self.users() == [(1, 'sue', True, []), (2, 'bob', None, [])], self.users()
+        assert loader._references['sue'] == 1
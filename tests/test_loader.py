@@ -1,9 +1,20 @@
 import os
-from bootalchemy.loader import YamlLoader
+import json
+import time
+import shutil
+import tempfile
+import base64
+import logging
+import threading
+import multiprocessing
+import yaml
+from bootalchemy.loader import YamlLoader, SafeFixtureLoader, DefaultYamlLoader
+from bootalchemy.pipeline import Pipeline
+from bootalchemy.keys import KeyAllocator
 from pprint import pprint, pformat
 
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, Table, Column, Integer, MetaData, Sequence
 
 import model
 engine = create_engine('sqlite://')
@@ -18,7 +29,7 @@ nested_test_file = os.path.dirname(__file__)+'/data/nested_data.yaml'
 
 class TestYamlLoader:
     
-    def setup(self):
+    def setup_method(self):
         self.loader = YamlLoader(model)
         self.session = Session()
     
@@ -28,6 +39,13 @@ class TestYamlLoader:
         for user in self.session.query(model.Group).all():
             self.session.delete(user)
         self.session.flush()
+
+    def teardown_method(self):
+        # every test shares the in-memory database; commit the cleanup so that it is
+        # not undone when an unclosed session is garbage collected later on.
+        TestYamlLoader.tearDown(self)
+        self.session.commit()
+        self.session.close()
         
     def test_loads(self):
         s = open(test_file).read()
@@ -108,3 +126,558 @@ class TestYamlLoader:
         assert normal_users_json == nested_users_json, \
             '\n' + pformat(normal_users_json) + '\n\n-^- not equal to -v-\n\n' + pformat(nested_users_json)
         
+
+class TestCastPlans:
+
+    def setup_method(self):
+        self.loader = YamlLoader(model)
+
+    def test_plan_is_cached(self):
+        plan = self.loader.cast_plan(model.User)
+        assert plan is self.loader.cast_plan(model.User)
+        assert plan['user_id'][0] is int, plan
+        assert plan['user_name'][1], plan
+
+    def test_check_types(self):
+        r = self.loader._check_types(model.User, {'user_id': '3', 'user_name': None,
+                                                  'active': 'no', 'groups': []})
+        assert r == {'user_id': 3, 'user_name': '', 'active': False, 'groups': []}, r
+
+    def test_prepare_cast_plans(self):
+        assert self.loader.prepare_cast_plans() == 3
+        assert model.Permission in self.loader._cast_plans
+
+    def test_model_change_clears_plans(self):
+        self.loader.cast_plan(model.User)
+        self.loader.model = ['model']
+        assert self.loader._cast_plans == {}
+
+class TestBulkYamlLoader(TestYamlLoader):
+
+    def setup_method(self):
+        self.loader = YamlLoader(model, bulk=True, batch_size=2)
+        self.session = Session()
+
+    def test_flat_rows_skip_the_session(self):
+        self.loader.from_list(self.session, [{'Group': [{'name': 'a'}, {'name': 'b'}, {'name': 'c'}]}])
+        assert not self.session.new
+        r = [g.name for g in self.session.query(model.Group).order_by(model.Group.group_id)]
+        assert r == ['a', 'b', 'c'], r
+
+    def test_columns_cast_once_per_batch(self):
+        calls = []
+        def upper(value):
+            calls.append(value)
+            return value.upper()
+        self.loader.cast_plan(model.Group)['display_name'] = (upper, True)
+        self.loader.from_list(self.session, [{'Group': [{'name': n, 'display_name': 'x'} for n in 'abc']}])
+        assert calls == ['x', 'x'], calls
+        r = set(g.display_name for g in self.session.query(model.Group))
+        assert r == set(['X']), r
+
+    def test_cast_failure_names_the_row(self):
+        items = [{'group_id': '1', 'name': 'a'}, {'group_id': 'x', 'name': 'b'}]
+        try:
+            self.loader.from_list(self.session, [{'Group': items}])
+        except ValueError:
+            pass
+        else:
+            assert False, 'the bad key should have been raised'
+        assert self.loader._failed == (model.Group, items[1]), self.loader._failed
+        self.session.rollback()
+
+class TestStreamingYamlLoader(TestYamlLoader):
+
+    def setup_method(self):
+        self.loader = YamlLoader(model, chunk_size=2)
+        self.loader.loads = self.loader.load_stream
+        self.session = Session()
+
+    def test_iter_groups(self):
+        groups = list(self.loader.iter_groups(open(test_file)))
+        assert [list(g.keys()) for g in groups] == [['User'], ['flush', 'commit'],
+                                                 ['Group'], ['Group'], ['Group'], ['flush'],
+                                                 ['User'], ['User']], groups
+        assert groups[2]['Group'][0] == {'name': 'teachers', 'group_id': '*id'}, groups[2]
+
+    def test_loadf(self):
+        self.loader.loadf(self.session, test_file, stream=True)
+        assert self.session.query(model.User).count() == 6
+
+class TestPipelinedYamlLoader(TestStreamingYamlLoader):
+
+    def setup_method(self):
+        self.loader = YamlLoader(model, chunk_size=2, pipeline=2)
+        self.loader.loads = self.loader.load_stream
+        self.session = Session()
+
+    def test_stats(self):
+        stats = self.loader.loadf(self.session, test_file)
+        assert stats.groups == 8, stats.as_dict()
+        assert 'wait' in stats.times and stats.times['parse'] > 0, stats.as_dict()
+        assert not [t for t in threading.enumerate() if t.name.startswith('bootalchemy-')]
+
+    def test_parse_error(self):
+        try:
+            self.loader.loads(self.session, '- Group:\n  - {name: a}\n  - {name: [b\n')
+        except yaml.YAMLError:
+            pass
+        else:
+            assert False, 'the parse error should have been raised'
+        assert not [t for t in threading.enumerate() if t.name.startswith('bootalchemy-')]
+
+    def test_parse_error_in_file(self):
+        # a file is parsed in a process of its own, which sends the error back.
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, 'broken.yaml')
+        with open(filename, 'w') as f:
+            f.write('- Group:\n  - {name: a}\n  - {name: [b\n')
+        try:
+            self.loader.loadf(self.session, filename)
+        except yaml.YAMLError:
+            pass
+        else:
+            assert False, 'the parse error should have been raised'
+        finally:
+            shutil.rmtree(directory)
+        assert not multiprocessing.active_children()
+        assert not [t for t in threading.enumerate() if t.name.startswith('bootalchemy-')]
+
+    def test_load_error_stops_the_stages(self):
+        doc = '- Group:\n' + ''.join('  - {name: g%d}\n' % i for i in range(50)) + \
+              '- User:\n  - {user_name: a, groups: [\'*missing\']}\n' + \
+              '- Group:\n' + ''.join('  - {name: h%d}\n' % i for i in range(50))
+        try:
+            self.loader.loads(self.session, doc)
+        except Exception:
+            pass
+        else:
+            assert False, 'the missing reference should have been raised'
+        assert not [t for t in threading.enumerate() if t.name.startswith('bootalchemy-')]
+        self.session.rollback()
+
+    def test_positions_kept_by_the_loading_thread(self):
+        threads = []
+        keep_positions = self.loader.keep_positions
+        def keep(items, marks):
+            threads.append(threading.current_thread())
+            keep_positions(items, marks)
+        self.loader.keep_positions = keep
+        self.loader.loads(self.session, open(test_file).read())
+        assert threads and set(threads) == set([threading.current_thread()]), threads
+
+    def test_values_cast_once(self):
+        calls = []
+        def upper(value):
+            calls.append(value)
+            return value.upper()
+        self.loader.cast_plan(model.Group)['display_name'] = (upper, True)
+        self.loader.loads(self.session, '- Group:\n' +
+                          ''.join('  - {name: g%d, display_name: x}\n' % i for i in range(3)))
+        assert calls == ['x', 'x', 'x'], calls
+
+    def test_cast_plans_built_once(self):
+        plans = []
+        def build():
+            plans.append(self.loader.cast_plan(model.User))
+        threads = [threading.Thread(target=build) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(plans) == 4 and all(plan is plans[0] for plan in plans), plans
+
+    def test_backpressure(self):
+        produced = []
+        def groups():
+            for i in range(20):
+                produced.append(i)
+                yield {'Group': [{'name': 'g%d' % i}]}
+        pipeline = Pipeline(groups(), None, 2)
+        try:
+            consumed = iter(pipeline)
+            next(consumed)
+            time.sleep(0.2)
+            # one group taken, two on the queue and one waiting to be put.
+            assert len(produced) <= 4, produced
+            assert [g['Group'][0]['name'] for g in consumed] == ['g%d' % i for i in range(1, 20)]
+        finally:
+            pipeline.close()
+
+class TestYamlBackend:
+
+    def test_default_backend(self):
+        loader = YamlLoader(model)
+        assert loader.yaml_backend == ('libyaml' if yaml.__with_libyaml__ else 'python')
+
+    def test_select_loader(self):
+        loader = YamlLoader(model, yaml_loader=SafeFixtureLoader)
+        assert loader.yaml_backend == 'python'
+        assert loader.yaml_loader_class is SafeFixtureLoader
+
+    def test_binary(self):
+        for loader_class in (SafeFixtureLoader, DefaultYamlLoader):
+            data = yaml.load("- Simple:\n  - {hash: !!binary '1yrdLS8QDAKYe28hBRURx3JEhLg='}\n",
+                             Loader=loader_class)
+            assert data[0]['Simple'][0]['hash'] == base64.b64decode('1yrdLS8QDAKYe28hBRURx3JEhLg='), data
+
+class TestDeferredReferences:
+
+    def setup_method(self):
+        self.loader = YamlLoader(model)
+        self.session = Session()
+
+    teardown_method = TestYamlLoader.teardown_method
+
+    def test_one_flush_per_block(self):
+        data = [{'Group': [{'group_id': '&g%d' % i, 'name': 'g%d' % i} for i in range(5)]},
+                {'User': [{'user_name': 'u%d' % i, 'user_id': '*g%d' % i} for i in range(5)]}]
+        self.loader.from_list(self.session, data)
+        assert self.loader.reference_flushes == 1, self.loader.reference_flushes
+        assert self.loader.flushes_saved == 4, self.loader.flushes_saved
+        assert self.loader._references['g4'] == self.loader._references['g0'] + 4
+
+class TestPreallocatedKeysYamlLoader(TestYamlLoader):
+
+    def setup_method(self):
+        self.loader = YamlLoader(model, preallocate_keys=True)
+        self.session = Session()
+
+    def test_references_need_no_flush(self):
+        data = [{'Group': [{'group_id': '&g%d' % i, 'name': 'g%d' % i} for i in range(5)]},
+                {'User': [{'user_name': 'u%d' % i, 'user_id': '*g%d' % i} for i in range(5)]}]
+        self.loader.from_list(self.session, data)
+        assert self.loader.reference_flushes == 0, self.loader.reference_flushes
+        assert self.loader.flushes_saved == 5, self.loader.flushes_saved
+        r = [(u.user_id, u.user_name) for u in self.session.query(model.User).order_by(model.User.user_id)]
+        assert r == [(self.loader._references['g%d' % i], 'u%d' % i) for i in range(5)], r
+
+    def test_bulk_rows(self):
+        # rows inserted through Core in bulk mode take allocated keys too.
+        loader = YamlLoader(model, preallocate_keys=True, bulk=True)
+        data = [{'Group': [{'name': 'orm', 'users': []}, {'name': 'flat1'}, {'name': 'flat2'},
+                           {'name': 'orm2', 'users': []}]}]
+        loader.from_list(self.session, data)
+        r = [g.name for g in self.session.query(model.Group).order_by(model.Group.group_id)]
+        assert r == ['orm', 'flat1', 'flat2', 'orm2'], r
+
+    def test_first_row_with_relationships(self):
+        # the first user is in the session through the groups backref before it is
+        # given a key; looking the key up must not flush it with a key of its own.
+        data = [{'Group': [{'&g%d' % i: {'name': 'g%d' % i}} for i in range(3)]},
+                {'User': [{'user_name': 'u0', 'groups': ['*g0', '*g1']},
+                          {'user_name': 'u1', 'groups': ['*g2']}]}]
+        for loader in (self.loader, YamlLoader(model, preallocate_keys=True, compact_references=True)):
+            loader.from_list(self.session, data)
+            self.session.flush()
+            self.session.expire_all()
+            r = [(u.user_name, sorted(g.name for g in u.groups))
+                 for u in self.session.query(model.User).order_by(model.User.user_id)]
+            assert r == [('u0', ['g0', 'g1']), ('u1', ['g2'])], r
+            self.tearDown()
+
+    def test_sequence_without_sequences(self):
+        # SQLite has no sequences, so a Sequence default is counted from MAX(pk).
+        table = Table('sequence_keys', MetaData(),
+                      Column('id', Integer, Sequence('sequence_keys_id'), primary_key=True))
+        table.create(bind=engine)
+        try:
+            self.session.execute(table.insert().values(id=4))
+            allocator = KeyAllocator(self.session)
+            assert [allocator.next_key(table.c.id) for i in range(2)] == [5, 6]
+        finally:
+            self.session.rollback()
+            table.drop(bind=engine)
+
+    def test_explicit_keys(self):
+        session = Session(autoflush=False)
+        try:
+            self.loader.from_list(session, [{'Group': [{'group_id': 1, 'name': 'a'}, {'name': 'b'}]}])
+            session.flush()
+            r = [(g.group_id, g.name) for g in session.query(model.Group).order_by(model.Group.group_id)]
+            assert r == [(1, 'a'), (2, 'b')], r
+        finally:
+            session.rollback()
+            session.close()
+
+class TestLoadStats:
+
+    def setup_method(self):
+        self.loader = YamlLoader(model)
+        self.session = Session()
+
+    teardown_method = TestYamlLoader.teardown_method
+
+    def test_stats(self):
+        stats = self.loader.loads(self.session, open(nested_test_file).read())
+        assert stats.rows == {'User': 6, 'Group': 5}, stats.rows
+        assert stats.groups == 3 and stats.commits == 1, stats.as_dict()
+        assert stats.peak_references == 8, stats.peak_references
+        assert stats.times['parse'] > 0 and stats.times['create_obj'] > 0, stats.times
+
+    def test_events(self):
+        events = []
+        for event in YamlLoader.events:
+            self.loader.listen(event, lambda *args, event=event: events.append(event))
+        self.loader.from_list(self.session, [{'Group': [{'group_id': '&g', 'name': 'g'}], 'commit': None}])
+        assert events == ['group_start', 'class_start', 'class_end', 'flush', 'reference',
+                          'commit', 'group_end'], events
+
+    def test_unknown_event(self):
+        try:
+            self.loader.listen('flsh', None)
+        except ValueError:
+            pass
+        else:
+            assert False, 'unknown event accepted'
+
+class TestMergeYamlLoader:
+
+    def setup_method(self):
+        self.loader = YamlLoader(model, merge=True, batch_size=2,
+                                 natural_keys={'User': 'user_name', model.Group: ('name',)})
+        self.session = Session()
+
+    teardown_method = TestYamlLoader.teardown_method
+
+    def test_reload(self):
+        s = open(test_file).read()
+        stats = self.loader.loads(self.session, s)
+        assert stats.updated == 0 and stats.unchanged == 0, stats.as_dict()
+        stats = YamlLoader(model, merge=True, natural_keys=self.loader.natural_keys).loads(self.session, s)
+        assert stats.updated == 0 and stats.unchanged == 11, stats.as_dict()
+        assert self.session.query(model.User).count() == 6
+        assert self.session.query(model.Group).count() == 5
+
+    def test_update_changed(self):
+        self.loader.from_list(self.session, [{'User': [{'user_name': 'sue', 'active': True},
+                                                       {'user_name': 'bob', 'active': True}]}])
+        stats = self.loader.from_list(self.session, [{'User': [{'&sue': {'user_name': 'sue', 'active': 'N'}},
+                                                               {'user_name': 'bob', 'active': 'Y'},
+                                                               {'user_name': 'ann'}]}])
+        assert (stats.updated, stats.unchanged) == (1, 1), stats.as_dict()
+        r = [(u.user_name, u.active) for u in self.session.query(model.User).order_by(model.User.user_id)]
+        assert r == [('sue', False), ('bob', True), ('ann', None)], r
+        assert self.loader._references['sue'].user_name == 'sue'
+
+    def test_primary_key(self):
+        loader = YamlLoader(model, merge=True)
+        loader.from_list(self.session, [{'Group': [{'group_id': 7, 'name': 'seven'}]}])
+        loader.from_list(self.session, [{'Group': [{'group_id': '7', 'name': 'seventh'}]}])
+        r = [(g.group_id, g.name) for g in self.session.query(model.Group)]
+        assert r == [(7, 'seventh')], r
+
+    def test_attribute_reference_key(self):
+        # the key a row stores as a reference is that of the earlier load.
+        loader = YamlLoader(model, merge=True)
+        loader.from_list(self.session, [{'Group': [{'group_id': '&g', 'name': 'first'}]}])
+        loader = YamlLoader(model, merge=True, references=loader._references)
+        stats = loader.from_list(self.session, [{'Group': [{'group_id': '&g', 'name': 'second'}]}])
+        assert stats.updated == 1, stats.as_dict()
+        r = [(g.group_id, g.name) for g in self.session.query(model.Group)]
+        assert r == [(loader._references['g'], 'second')], r
+
+    def test_refuses_bulk(self):
+        try:
+            YamlLoader(model, merge=True, bulk=True)
+        except ValueError:
+            pass
+        else:
+            assert False, 'merge and bulk should have been refused'
+
+class TestIncrementalYamlLoader:
+
+    def setup_method(self):
+        self.session = Session()
+
+    def teardown_method(self):
+        from bootalchemy.incremental import group_table
+        TestYamlLoader.tearDown(self)
+        self.session.execute(group_table.delete())
+        self.session.commit()
+
+    def test_unchanged(self):
+        stats = YamlLoader(model, incremental=True).loadf(self.session, test_file)
+        assert (stats.groups, stats.skipped_groups) == (3, 0), stats.as_dict()
+        loader = YamlLoader(model, incremental=True)
+        statements = []
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            stats = loader.loadf(self.session, test_file)
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+        assert (stats.groups, stats.skipped_groups) == (0, 3), stats.as_dict()
+        # the four groups referenced are restored with one query.
+        assert len([s for s in statements if 'FROM tg_group' in s]) == 1, statements
+        assert self.session.query(model.User).count() == 6
+        assert self.session.query(model.Group).count() == 5
+        assert loader._references['id'] == self.session.query(model.User).filter_by(user_name='peggy').one().user_id
+        assert loader._references['players_group'].name == 'players'
+
+    def test_changed_upstream(self):
+        def load(data):
+            loader = YamlLoader(model, incremental=True, merge=True,
+                                natural_keys={'User': 'user_name', 'Group': 'name'})
+            loader.source = 'staff'
+            return loader.from_list(self.session, data)
+        data = [{'Group': [{'&staff': {'name': 'staff'}}]},
+                {'User': [{'user_name': 'ann', 'groups': ['*staff']}]}]
+        stats = load(data)
+        assert (stats.groups, stats.skipped_groups) == (2, 0), stats.as_dict()
+
+        # the group is updated in place, so the user referencing it is left alone.
+        data[0] = {'Group': [{'&staff': {'name': 'staff', 'display_name': 'Staff'}}]}
+        stats = load(data)
+        assert (stats.groups, stats.skipped_groups, stats.updated) == (1, 1, 1), stats.as_dict()
+
+        # a new group is a new reference, and the user is loaded again.
+        data[0] = {'Group': [{'&staff': {'name': 'crew'}}]}
+        stats = load(data)
+        assert (stats.groups, stats.skipped_groups) == (2, 0), stats.as_dict()
+        ann = self.session.query(model.User).filter_by(user_name='ann').one()
+        assert [g.name for g in ann.groups] == ['crew'], ann.groups
+
+    def test_changed_group(self):
+        # a changed group is merged over the rows it loaded before.
+        from bootalchemy.incremental import group_table
+        def load(data):
+            loader = YamlLoader(model, incremental=True, natural_keys={'Group': 'name'})
+            loader.source = 'groups'
+            return loader.from_list(self.session, data)
+        load([{'Group': [{'&a': {'name': 'a'}}]}])
+        stats = load([{'Group': [{'&a': {'name': 'a'}}, {'name': 'b'}]}])
+        assert (stats.groups, stats.unchanged) == (1, 1), stats.as_dict()
+        r = [g.name for g in self.session.query(model.Group).order_by(model.Group.name)]
+        assert r == ['a', 'b'], r
+        a = self.session.query(model.Group).filter_by(name='a').one()
+        refs = [json.loads(row.refs) for row in self.session.execute(group_table.select())]
+        # the row of the group as it was is left in the table.
+        assert refs == [[['a', 'object', ['Group', [a.group_id]]]]] * 2, refs
+
+class TestCompactReferencesYamlLoader(TestYamlLoader):
+
+    def setup_method(self):
+        self.loader = YamlLoader(model, compact_references=True)
+        self.session = Session()
+
+    def test_identities(self):
+        from bootalchemy.references import Identity
+        self.loader.loadf(self.session, test_file)
+        references = self.loader._references
+        group = self.session.query(model.Group).filter_by(name='students').one()
+        assert references._values['students_group'] == Identity((0, group.group_id)), references._values
+        assert not references._pending
+        assert references['students_group'] is group
+        assert self.loader.resolve_key('*students_group') == group.group_id
+        assert self.loader.resolve_key('*id') == references['id']
+
+    def test_pending_until_flushed(self):
+        self.loader.session = self.session
+        self.loader._references.session = self.session
+        self.loader.add_klass_with_values(model.Group, {'&g': {'name': 'pending'}})
+        assert self.loader._references['g'].name == 'pending'
+        assert list(self.loader._references._pending) == ['g']
+        group_id = self.loader.resolve_key('*g')
+        assert group_id is not None
+        assert self.loader._references._values['g'][1] == group_id
+
+class TestChunkedYamlLoader(TestYamlLoader):
+
+    def setup_method(self):
+        self.loader = YamlLoader(model, flush_every=2, commit_every=3, expunge=True, compact_references=True)
+        self.session = Session()
+
+    def test_flush_every(self):
+        loader = YamlLoader(model, flush_every=3, expunge=True, compact_references=True)
+        data = [{'Group': [{'&g%d' % i: {'name': 'g%d' % i}} for i in range(10)]},
+                {'User': [{'user_name': 'u%d' % i, 'groups': ['*g%d' % i]} for i in range(10)]}]
+        stats = loader.from_list(self.session, data)
+        assert stats.flushes == 6, stats.as_dict()
+        assert len(self.session.identity_map) <= 3, len(self.session.identity_map)
+        self.session.flush()
+        users = self.session.query(model.User).order_by(model.User.user_id).all()
+        assert [u.groups[0].name for u in users] == ['g%d' % i for i in range(10)]
+
+    def test_commit_every(self):
+        loader = YamlLoader(model, commit_every=4)
+        stats = loader.from_list(self.session, [{'Group': [{'name': 'g%d' % i} for i in range(10)]}])
+        assert stats.commits == 2, stats.as_dict()
+        assert self.session.query(model.Group).count() == 10
+
+class ListHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+class TestErrorDiagnostics:
+
+    doc = '\n'.join(["- Group:",
+                     "  - '&g': {name: g}",
+                     "- User:",
+                     "  - user_name: a",
+                     "    groups: ['*g']",
+                     "  - user_name: b",
+                     "    groups: ['*g', '*missing']",
+                     ""])
+
+    def setup_method(self):
+        self.session = Session()
+        self.handler = ListHandler()
+        logging.getLogger('bootalchemy').addHandler(self.handler)
+
+    def teardown_method(self):
+        logging.getLogger('bootalchemy').removeHandler(self.handler)
+        self.session.rollback()
+        self.session.close()
+
+    def load(self, loader, stream=False):
+        try:
+            if stream:
+                loader.load_stream(self.session, self.doc)
+            else:
+                loader.loads(self.session, self.doc)
+        except Exception:
+            pass
+        else:
+            assert False, 'the load should have failed'
+        return self.handler.messages
+
+    def test_item_position_and_references(self):
+        messages = self.load(YamlLoader(model))
+        assert "item: {'groups': ['*g', '*missing'], 'user_name': 'b'}" in messages, messages
+        assert 'class: User' in messages, messages
+        assert 'at: UNKNOWN, line 6, column 5' in messages, messages
+        assert '  *missing: not defined' in messages, messages
+        assert [m for m in messages if m.startswith('  *g: ')], messages
+        assert not [m for m in messages if 'name: g' in m and 'Group' not in m], messages
+
+    def test_streamed_position(self):
+        messages = self.load(YamlLoader(model, chunk_size=1), stream=True)
+        assert 'at: UNKNOWN, line 6, column 5' in messages, messages
+
+    def test_bulk_position(self):
+        # a bulk row that fails to cast is found by its index in the class block.
+        self.doc = '\n'.join(["- Group:",
+                               "  - {name: a}",
+                               "  - {name: b}",
+                               "  - {name: c, group_id: x}",
+                               ""])
+        messages = self.load(YamlLoader(model, bulk=True, batch_size=2))
+        assert 'at: UNKNOWN, line 4, column 5' in messages, messages
+
+    def test_compact_references(self):
+        loader = YamlLoader(model, compact_references=True)
+        self.doc = self.doc.replace('- User:', '  flush:\n- User:')
+        messages = self.load(loader)
+        assert [m for m in messages if m.startswith('  *g: <Group ')], messages
+
+    def test_bounded(self):
+        self.doc = self.doc.replace("user_name: b", "user_name: %s" % ('x' * 100000))
+        messages = self.load(YamlLoader(model))
+        assert sum(len(m) for m in messages) < 2000, sum(len(m) for m in messages)
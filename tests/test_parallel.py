@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from bootalchemy.parallel import ParallelLoader, ObjectReference, export_references, import_references
+
+import model
+
+test_file = os.path.dirname(__file__)+'/data/test_data.yaml'
+
+class TestParallelLoader:
+
+    def setup_method(self):
+        self.directory = tempfile.mkdtemp()
+        self.url = 'sqlite:///' + os.path.join(self.directory, 'parallel.db')
+        self.engine = create_engine(self.url)
+        model.metadata.create_all(bind=self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.loader = ParallelLoader(['model'], processes=2)
+
+    def teardown_method(self):
+        self.session.close()
+        self.engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def test_levels(self):
+        data = [{'Group': [{'&a': {'name': 'a'}}]},
+                {'Group': [{'name': 'b'}]},
+                {'User': [{'user_name': 'u', 'groups': ['*a']}]}]
+        levels = self.loader.levels(data)
+        assert [[[index for index, group in p] for p in level] for level in levels] == [[[0], [1]], [[2]]], levels
+
+    def test_loadf(self):
+        stats = self.loader.loadf(self.url, test_file)
+        assert stats.rows == {'User': 6, 'Group': 5}, stats.as_dict()
+        references = self.loader.references
+        assert isinstance(references['students_group'], ObjectReference), references
+        users = self.session.query(model.User).order_by(model.User.user_name).all()
+        r = [(u.user_name, sorted(g.name for g in u.groups)) for u in users]
+        assert r == [('billy', ['players', 'students']), ('bobby', ['players', 'students']),
+                     ('bully', ['bullies']), ('peggy', []), ('sue', []),
+                     ('\xe9cho', ['\xe0\xe9\xef\xf4u'])], r
+
+    def test_import_references(self):
+        groups = [model.Group(name='g%d' % i) for i in range(3)]
+        user = model.User(user_name='u')
+        self.session.add_all(groups + [user])
+        self.session.commit()
+        references = dict(('g%d' % i, group) for i, group in enumerate(groups))
+        references.update(u=user, n=1)
+        exported = export_references(references)
+        exported['gone'] = ObjectReference(('model', 'Group', (99,)))
+        statements = []
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(self.engine, 'before_cursor_execute', count)
+        session = sessionmaker(bind=self.engine)()
+        try:
+            imported = import_references(session, exported, batch_size=2)
+            assert [imported['g%d' % i].name for i in range(3)] == ['g0', 'g1', 'g2'], imported
+            assert imported['u'].user_name == 'u' and imported['n'] == 1, imported
+            assert imported['gone'] is None, imported
+            # groups in batches of two and the user: three queries, not one per key.
+            assert len(statements) == 3, statements
+        finally:
+            event.remove(self.engine, 'before_cursor_execute', count)
+            session.close()
@@ -0,0 +1,36 @@
+from bootalchemy.registry import ClassRegistry
+from bootalchemy.loader import YamlLoader
+
+import model
+
+class TestClassRegistry:
+
+    def test_module(self):
+        registry = ClassRegistry(model)
+        assert registry.get('User') is model.User
+        assert registry._names == {'User': model.User}
+
+    def test_misses_are_cached(self):
+        registry = ClassRegistry([model])
+        assert registry.get('Missing') is None
+        assert 'Missing' in registry._names
+
+    def test_dotted_names(self):
+        registry = ClassRegistry(['model'])
+        assert registry.get('model.Group') is model.Group
+        assert registry.get('other.Group') is None
+
+    def test_declarative_base(self):
+        registry = ClassRegistry(model.DeclarativeBase)
+        assert registry.get('Group') is model.Group
+        assert registry.get('model.Permission') is model.Permission
+
+    def test_lazy(self):
+        loader = YamlLoader(['no_such_model_module'])
+        assert loader.registry._modules is None
+        try:
+            loader.get_klass('User')
+        except ImportError:
+            pass
+        else:
+            assert False
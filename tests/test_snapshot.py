@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from bootalchemy.snapshot import FixtureSnapshot
+
+import model
+from test_loader import test_file
+
+class TestFixtureSnapshot:
+
+    def setup_method(self):
+        self.directory = tempfile.mkdtemp()
+        self.snapshot = FixtureSnapshot('sqlite://', model.metadata, model, [test_file],
+                                        directory=self.directory)
+
+    def teardown_method(self):
+        shutil.rmtree(self.directory)
+
+    def query(self, url, klass):
+        engine = create_engine(url)
+        session = sessionmaker(bind=engine)()
+        try:
+            return sorted(x.name for x in session.query(klass))
+        finally:
+            session.close()
+            engine.dispose()
+
+    def test_clone(self):
+        url = self.snapshot.clone()
+        assert self.query(url, model.Group) == ['bullies', 'players', 'students', 'teachers', '\xe0\xe9\xef\xf4u']
+        template = self.snapshot.template()
+        assert os.path.basename(template.database) == self.snapshot.key + '.sqlite'
+        self.snapshot.drop(url)
+        assert not os.path.exists(url.database)
+
+    def test_template_is_reused(self):
+        template = self.snapshot.template()
+        mtime = os.path.getmtime(template.database)
+        other = FixtureSnapshot('sqlite://', model.metadata, model, [test_file], directory=self.directory)
+        assert other.key == self.snapshot.key
+        assert other.template() == template
+        assert os.path.getmtime(template.database) == mtime
+
+    def test_clones_are_independent(self):
+        first, second = self.snapshot.clone(), self.snapshot.clone()
+        engine = create_engine(first)
+        engine.execute(model.Group.__table__.delete())
+        engine.dispose()
+        assert self.query(first, model.Group) == []
+        assert len(self.query(second, model.Group)) == 5
+
+    def test_key_depends_on_fixtures(self):
+        filename = os.path.join(self.directory, 'groups.yaml')
+        with open(filename, 'w') as f:
+            f.write('- Group:\n  - {name: other}\n')
+        other = FixtureSnapshot('sqlite://', model.metadata, model, [filename], directory=self.directory)
+        assert other.key != self.snapshot.key
+        assert self.query(other.clone(), model.Group) == ['other']
+
+    def test_unsupported_dialect(self):
+        snapshot = FixtureSnapshot('mysql://', model.metadata, model, [test_file],
+                                   directory=self.directory)
+        try:
+            snapshot.template()
+        except ValueError as e:
+            assert 'mysql' in str(e), e
+        else:
+            assert False, 'mysql should have been refused'
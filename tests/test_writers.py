@@ -0,0 +1,104 @@
+import os
+import datetime
+from unittest import SkipTest
+
+from sqlalchemy import MetaData, Table, Column, Integer, Unicode, Sequence, create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from bootalchemy.loader import Loader
+from bootalchemy.writers import Writer, ExecuteManyWriter, MultiValuesWriter, CopyWriter, copy_text, fill_defaults
+
+import model
+from test_loader import Session
+
+class RecordingWriter(ExecuteManyWriter):
+
+    def __init__(self):
+        self.batches = []
+
+    def write(self, session, table, rows):
+        self.batches.append((table.name, len(rows)))
+        ExecuteManyWriter.write(self, session, table, rows)
+
+class TestWriters:
+
+    def setup_method(self):
+        self.session = Session()
+
+    def teardown_method(self):
+        self.session.rollback()
+
+    def load(self, **kw):
+        loader = Loader(model, bulk=True, batch_size=3, **kw)
+        loader.from_list(self.session, [{'Group': [{'name': 'g%d' % i} for i in range(5)],
+                                         'Permission': [{'permission_name': 'p'}]}])
+        return [g.name for g in self.session.query(model.Group).order_by(model.Group.group_id)]
+
+    def test_multi_values(self):
+        r = self.load(writer=MultiValuesWriter(max_parameters=2))
+        assert r == ['g0', 'g1', 'g2', 'g3', 'g4'], r
+
+    def test_dialect_writer(self):
+        writer = RecordingWriter()
+        self.load(writer={'sqlite': writer, 'default': Writer()})
+        assert writer.batches == [('tg_group', 3), ('tg_group', 2), ('tg_permission', 1)], writer.batches
+
+    def test_class_writer(self):
+        writer = RecordingWriter()
+        self.load(writer=Writer(), class_writers={'Group': writer, model.Permission: writer})
+        assert writer.batches == [('tg_group', 3), ('tg_group', 2), ('tg_permission', 1)], writer.batches
+
+def test_copy_text():
+    r = [copy_text(v) for v in (None, True, 3, 'a\tb\\', b'\x01', datetime.datetime(2010, 1, 2, 3, 4, 5), ['x', None])]
+    assert r == ['\\N', 't', '3', 'a\\tb\\\\', '\\\\x01', '2010-01-02 03:04:05', '{"x",NULL}'], r
+
+def defaults_table(metadata):
+    return Table('writer_defaults', metadata,
+                 Column('id', Integer, primary_key=True),
+                 Column('name', Unicode(20)),
+                 Column('size', Integer, default=3),
+                 Column('label', Unicode(20), default=lambda context: context.get_current_parameters()['name'] + '!'))
+
+def test_fill_defaults():
+    table = defaults_table(MetaData())
+    rows = [{'name': 'a'}, {'name': 'b'}]
+    r = fill_defaults(table, rows)
+    assert r == [{'name': 'a', 'size': 3, 'label': 'a!'}, {'name': 'b', 'size': 3, 'label': 'b!'}], r
+    assert rows == [{'name': 'a'}, {'name': 'b'}], rows
+    r = fill_defaults(table, [{'name': 'a', 'size': 5, 'label': None}])
+    assert r == [{'name': 'a', 'size': 5, 'label': None}], r
+
+def test_fill_defaults_refuses_database_defaults():
+    for default in (Sequence('writer_seq'), func.now()):
+        table = Table('writer_refused', MetaData(), Column('id', Integer, primary_key=True),
+                      Column('value', Integer, default=default))
+        try:
+            fill_defaults(table, [{'id': 1}])
+        except ValueError:
+            pass
+        else:
+            assert False, 'the %r default should have been refused' % default
+
+def test_copy_writer_defaults():
+    # set BOOTALCHEMY_POSTGRES_URL to a scratch PostgreSQL database to run this.
+    url = os.environ.get('BOOTALCHEMY_POSTGRES_URL')
+    if not url:
+        raise SkipTest('needs BOOTALCHEMY_POSTGRES_URL')
+    engine = create_engine(url)
+    metadata = MetaData()
+    table = defaults_table(metadata)
+    metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        rows = [{'name': 'a'}, {'name': 'b'}]
+        CopyWriter().write(session, table, rows)
+        copied = sorted(tuple(r)[1:] for r in session.execute(table.select()))
+        session.execute(table.delete())
+        ExecuteManyWriter().write(session, table, rows)
+        inserted = sorted(tuple(r)[1:] for r in session.execute(table.select()))
+        assert copied == inserted == [('a', 3, 'a!'), ('b', 3, 'b!')], (copied, inserted)
+    finally:
+        session.rollback()
+        session.close()
+        metadata.drop_all(bind=engine)
+        engine.dispose()